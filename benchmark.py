@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks for the ordering strategies and calc functions.
+
+Times `frequency`, `frequency_optimised` and `next_best` on every combination
+of `ChunkType` and `TokenType` in `gnt_data` and on synthetic corpora with a
+Zipfian item distribution, reporting wall time, peak memory and steps (targets
+yielded) per second. Results are saved as JSON so runs can be compared:
+
+    ./benchmark.py --output before.json
+    ... make changes ...
+    ./benchmark.py --output after.json --compare before.json
+
+A run that fails is recorded with its `error` rather than stopping the rest,
+and the output file is rewritten as each result comes in so a run cut short
+still leaves the results so far.
+
+Run `./benchmark.py --help` for the options to restrict what is run.
+"""
+
+import argparse
+import collections
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from sequencing_tools import calc, ordering
+from sequencing_tools.problem import Problem
+
+STRATEGIES = ["frequency", "frequency_optimised", "next_best"]
+
+
+def zipf_target_items(target_count, item_count, mean_length, exponent=1.0, seed=0):
+    """
+    Return a synthetic `target_items` dictionary of `target_count` targets
+    whose lengths average `mean_length` and whose items are drawn from
+    `item_count` items with Zipfian frequencies.
+    """
+    rng = random.Random(seed)
+    items = [f"item{i}" for i in range(item_count)]
+    cumulative_weights = list(
+        itertools.accumulate(
+            1 / (rank ** exponent) for rank in range(1, item_count + 1)
+        )
+    )
+    return {
+        f"target{i}": rng.choices(
+            items,
+            cum_weights=cumulative_weights,
+            k=max(1, round(rng.expovariate(1 / mean_length))),
+        )
+        for i in range(target_count)
+    }
+
+
+def measure(function, memory=True):
+    """
+    Call `function` and return its result along with the wall time taken and
+    (if `memory`) the peak memory allocated while running it, measured in a
+    second run under `tracemalloc` so it doesn't distort the timing.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def failed(name, corpus, target_items, error):
+    """
+    the result of a benchmark that raised `error`
+    """
+    return {
+        "name": name,
+        "corpus": corpus,
+        "targets": len(target_items),
+        "steps": None,
+        "seconds": None,
+        "steps_per_second": None,
+        "peak_bytes": None,
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+def bench_strategy(name, corpus, strategy, target_items, limit, memory):
+    def run():
+        steps = 0
+        for target, items_to_learn in itertools.islice(strategy(target_items), limit):
+            steps += 1
+        return steps
+
+    try:
+        steps, elapsed, peak = measure(run, memory)
+    except Exception as error:
+        return failed(name, corpus, target_items, error)
+    return {
+        "name": name,
+        "corpus": corpus,
+        "targets": len(target_items),
+        "steps": steps,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed else None,
+        "peak_bytes": peak,
+    }
+
+
+def bench_calc(corpus, target_items, memory):
+    counter = collections.Counter(itertools.chain.from_iterable(target_items.values()))
+    coverage = [i / 20 for i in range(1, 21)]
+    item_counts = [100 * i for i in range(1, 51)]
+    benchmarks = {
+        "Frequencies": lambda: calc.Frequencies(counter),
+        "tokens_for_coverage": lambda: calc.tokens_for_coverage(counter, 0.5),
+        "rank_with_ties": lambda: calc.rank_with_ties(counter),
+        "cumulative_frequency": lambda: calc.cumulative_frequency(counter),
+        "coverage_table": lambda: calc.coverage_table(
+            counter, target_items, coverage, item_counts
+        ),
+    }
+    for name, function in benchmarks.items():
+        try:
+            result, elapsed, peak = measure(function, memory)
+        except Exception as error:
+            yield failed(name, corpus, target_items, error)
+            continue
+        yield {
+            "name": name,
+            "corpus": corpus,
+            "targets": len(target_items),
+            "steps": None,
+            "seconds": elapsed,
+            "steps_per_second": None,
+            "peak_bytes": peak,
+        }
+
+
+def corpora(args):
+    """
+    generate `(corpus name, target_items)` for each corpus to benchmark
+    """
+    if not args.no_gnt:
+        from gnt_data import ChunkType, TokenType, get_tokens_by_chunk
+
+        for chunk_type in args.chunk_types or [t.name for t in ChunkType]:
+            for token_type in args.token_types or [t.name for t in TokenType]:
+                yield f"gnt:{token_type}/{chunk_type}", get_tokens_by_chunk(
+                    TokenType[token_type], ChunkType[chunk_type]
+                )
+
+    for target_count in args.synthetic_targets:
+        yield f"zipf:{target_count}", zipf_target_items(
+            target_count,
+            args.synthetic_items,
+            args.synthetic_length,
+            args.zipf_exponent,
+        )
+
+
+def print_result(result, baseline=None):
+    if "error" in result:
+        print(
+            "{:22s} {:28s} {:>7d} failed: {}".format(
+                result["name"], result["corpus"], result["targets"], result["error"]
+            ),
+            flush=True,
+        )
+        return
+    peak = result["peak_bytes"]
+    line = "{:22s} {:28s} {:>7d} {:>9.3f}s {:>10s} {:>10s}".format(
+        result["name"],
+        result["corpus"],
+        result["targets"],
+        result["seconds"],
+        ""
+        if result["steps_per_second"] is None
+        else f"{result['steps_per_second']:.0f}/s",
+        "" if peak is None else f"{peak / 2 ** 20:.1f}MB",
+    )
+    if baseline and baseline["seconds"]:
+        line += " {:+.1%}".format(result["seconds"] / baseline["seconds"] - 1)
+    print(line, flush=True)
+
+
+def save(path, args, started, results):
+    """
+    write the results so far to the JSON file at `path` (via a temporary file
+    so it is never left half written)
+    """
+    with open(path + ".tmp", "w") as f:
+        json.dump(
+            {
+                "python": sys.version,
+                "platform": platform.platform(),
+                "time": started,
+                "args": vars(args),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    os.replace(path + ".tmp", path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--strategies", nargs="*", default=STRATEGIES, choices=STRATEGIES
+    )
+    parser.add_argument("--chunk-types", nargs="*", help="default: all")
+    parser.add_argument("--token-types", nargs="*", help="default: all")
+    parser.add_argument("--no-gnt", action="store_true", help="skip the GNT corpora")
+    parser.add_argument(
+        "--synthetic-targets",
+        nargs="*",
+        type=int,
+        default=[1000, 10000, 100000],
+        help="the number of targets in each synthetic corpus",
+    )
+    parser.add_argument("--synthetic-items", type=int, default=20000)
+    parser.add_argument("--synthetic-length", type=float, default=15)
+    parser.add_argument("--zipf-exponent", type=float, default=1.0)
+    parser.add_argument(
+        "--limit", type=int, help="stop each strategy after this many steps"
+    )
+    parser.add_argument(
+        "--no-calc", action="store_true", help="skip the calc functions"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip measuring peak memory"
+    )
+    parser.add_argument(
+        "--compiled", action="store_true", help="pass the strategies a Problem"
+    )
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="show the change in time from this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            for result in json.load(f)["results"]:
+                baseline[result["name"], result["corpus"]] = result
+
+    memory = not args.no_memory
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    results = []
+
+    def record(result):
+        results.append(result)
+        print_result(result, baseline.get((result["name"], result["corpus"])))
+        if args.output:
+            save(args.output, args, started, results)
+
+    for corpus, target_items in corpora(args):
+        if args.compiled:
+            target_items = Problem(target_items)
+        for name in args.strategies:
+            record(
+                bench_strategy(
+                    name,
+                    corpus,
+                    getattr(ordering, name),
+                    target_items,
+                    args.limit,
+                    memory,
+                )
+            )
+        if not args.no_calc and not args.compiled:
+            for result in bench_calc(corpus, target_items, memory):
+                record(result)
+
+
+if __name__ == "__main__":
+    main()
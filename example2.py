@@ -4,6 +4,7 @@ from itertools import islice
 
 from gnt_data import ChunkType, TokenType, get_tokens, get_tokens_by_chunk
 from sequencing_tools.ordering import frequency, frequency_optimised, next_best
+from sequencing_tools.session import FrequencyOptimisedSession, FrequencySession
 
 # for GNT data, we can get our target-item data from the `gnt_data` module.
 # so imagine we wanted to use lemmas as items and sentences as targets:
@@ -57,3 +58,18 @@ for strategy in (frequency, frequency_optimised, next_best):
     )
     print(target, get_text(target_type, target))
     print(items_to_learn)
+
+
+# the same workflow with a session, which keeps its state between steps
+# rather than rebuilding it on each call
+
+for session_class in (FrequencySession, FrequencyOptimisedSession):
+    print()
+    print(session_class.__name__)
+    print()
+
+    session = session_class(target_items)
+    for i in range(2):
+        target, items_to_learn = session.advance()
+        print(target, get_text(target_type, target))
+        print(items_to_learn)
@@ -2,7 +2,14 @@
 
 from itertools import islice
 
-from gnt_data import ChunkType, TokenType, get_tokens, get_tokens_by_chunk, chunk_data
+from gnt_data import (
+    ChunkType,
+    TokenType,
+    get_tokens,
+    get_tokens_by_chunk,
+    chunk_data,
+    overlapping_chunks,
+)
 from sequencing_tools.ordering import next_best
 
 
@@ -12,7 +19,9 @@ item_type3 = TokenType.hybrid
 
 target_type = ChunkType.sentence
 
-target_items3 = get_tokens_by_chunk(item_type3, target_type, condition=lambda chunk_id: chunk_id.startswith("64"))
+target_items3 = get_tokens_by_chunk(
+    item_type3, target_type, within=(ChunkType.book, "64")
+)
 
 
 def get_text(chunk_type, chunk_id):
@@ -54,5 +63,7 @@ for target, items_to_learn in gen:  #islice(gen, 20):
     print()
     print(f"sent_{target}:")
     print("    token_range: {}-{}".format(*chunk_data[ChunkType.sentence, target]))
+    verses = overlapping_chunks(ChunkType.sentence, target, ChunkType.verse)
+    print("    verses:", " ".join(verses))
     print("    text:", get_text(target_type, target))
     print("    new:", items_to_learn)
@@ -1 +1,15 @@
-from .main import ChunkType, TokenType, get_tokens, get_token_dicts, get_tokens_by_chunk, chunk_ids, chunk_data  # noqa: F401
+from .main import (  # noqa: F401
+    ChunkType,
+    TokenType,
+    get_tokens,
+    get_token_dicts,
+    get_tokens_by_chunk,
+    chunk_ids,
+    chunk_data,
+    chunks_containing,
+    chunks_within,
+    chunks_with_prefix,
+    overlapping_chunks,
+    gnt,
+)
+from .corpus import Corpus  # noqa: F401
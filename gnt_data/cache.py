@@ -0,0 +1,238 @@
+"""
+A compiled on-disk form of the token and chunk data.
+
+The file consists of a short JSON header followed by binary sections. Each
+string column (e.g. the lemma of every token) is stored as a table of the
+distinct strings plus a fixed-width integer column of indexes into that
+table, and each chunk type as its table of ids plus arrays of token start and
+end. The file is opened with `mmap` so the integer columns are never copied
+into Python objects (and forked processes share the pages).
+
+The header records the size and modification time of the source files the
+cache was built from so it can be rebuilt whenever they change.
+"""
+
+from array import array
+from collections.abc import Sequence
+import io
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+MAGIC = b"GNTC"
+VERSION = 1
+
+# magic, version, header length
+PREAMBLE = struct.Struct("<4sII")
+
+ALIGNMENT = 8
+
+
+class Column(Sequence):
+    """
+    A read-only sequence of strings stored as integer `codes` into a `table`
+    of distinct strings.
+
+    Slicing returns another `Column` sharing the same table and codes (so
+    nothing is copied) which otherwise behaves like the list it replaces.
+    """
+
+    __slots__ = ("table", "codes")
+
+    def __init__(self, table, codes):
+        self.table = table
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                return list(map(self.table.__getitem__, self.codes[index]))
+            return Column(self.table, self.codes[index])
+        return self.table[self.codes[index]]
+
+    def __iter__(self):
+        return map(self.table.__getitem__, self.codes)
+
+    def __eq__(self, other):
+        if isinstance(other, (Column, list, tuple)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def source_signature(paths):
+    """
+    the size and modification time of each of the given files
+    """
+    signature = {}
+    for path in paths:
+        stat = os.stat(path)
+        signature[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def encode_strings(strings):
+    """
+    intern `strings`, returning the table of distinct strings (in order of
+    first appearance) and an array of codes into it
+    """
+    index = {}
+    codes = array("I")
+    for string in strings:
+        code = index.get(string)
+        if code is None:
+            code = index[string] = len(index)
+        codes.append(code)
+    return list(index), codes
+
+
+def write_cache(f, sources, columns, chunks):
+    """
+    write a cache to the binary file object `f`.
+
+    `sources` is a `source_signature`, `columns` maps a column name to a list
+    of strings (one per token) and `chunks` maps a chunk name to a list of
+    `(chunk_id, token_start, token_end)`.
+    """
+    sections = []
+
+    for name, strings in columns.items():
+        table, codes = encode_strings(strings)
+        sections.append((f"column.{name}.table", "\n".join(table).encode("utf-8")))
+        sections.append((f"column.{name}.codes", codes.tobytes()))
+
+    for name, rows in chunks.items():
+        ids = "\n".join(row[0] for row in rows).encode("utf-8")
+        sections.append((f"chunk.{name}.ids", ids))
+        sections.append((f"chunk.{name}.start", array("I", (row[1] for row in rows))))
+        sections.append((f"chunk.{name}.end", array("I", (row[2] for row in rows))))
+
+    sections = [
+        (name, data.tobytes() if isinstance(data, array) else data)
+        for name, data in sections
+    ]
+
+    offset = 0
+    layout = {}
+    for name, data in sections:
+        layout[name] = [offset, len(data)]
+        offset += len(data) + -len(data) % ALIGNMENT
+
+    header = json.dumps(
+        {
+            "sources": sources,
+            "columns": list(columns),
+            "chunks": list(chunks),
+            "sections": layout,
+        }
+    ).encode("utf-8")
+    header += b" " * (-(PREAMBLE.size + len(header)) % ALIGNMENT)
+
+    f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+    f.write(header)
+    for name, data in sections:
+        f.write(data)
+        f.write(b"\0" * (-len(data) % ALIGNMENT))
+
+
+def save_cache(path, sources, columns, chunks):
+    """
+    write a cache file to `path` (via a temporary file moved into place so a
+    reader never sees a partially written cache)
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_cache(f, sources, columns, chunks)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class Cache:
+    """
+    An opened cache file (or, failing that, the bytes of one).
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, header_length = PREAMBLE.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a cache file of this version")
+        self.header = json.loads(
+            bytes(buffer[PREAMBLE.size : PREAMBLE.size + header_length])  # noqa: E203
+        )
+        self.base = PREAMBLE.size + header_length
+        self.view = memoryview(buffer)
+
+    def section(self, name):
+        offset, length = self.header["sections"][name]
+        start = self.base + offset
+        return self.view[start : start + length]  # noqa: E203
+
+    def strings(self, name):
+        data = self.section(name)
+        return str(data, "utf-8").split("\n") if len(data) else []
+
+    def ints(self, name):
+        return self.section(name).cast("I")
+
+    def column(self, name):
+        return Column(
+            self.strings(f"column.{name}.table"), self.ints(f"column.{name}.codes")
+        )
+
+    def chunk(self, name):
+        """
+        the ids, token starts and token ends of the chunks called `name`
+        """
+        return (
+            self.strings(f"chunk.{name}.ids"),
+            self.ints(f"chunk.{name}.start"),
+            self.ints(f"chunk.{name}.end"),
+        )
+
+
+def open_cache(path, source_paths, build):
+    """
+    Open the cache at `path`, first (re)building it if it is missing or was
+    built from different versions of the files in `source_paths`.
+
+    `build` is called with no arguments to produce the `columns` and `chunks`
+    to pass to `write_cache`. If the cache can't be written (e.g. the
+    directory is read-only) the data is used from memory instead.
+    """
+    sources = source_signature(source_paths)
+
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        cache = Cache(buffer)
+        if cache.header["sources"] == sources:
+            return cache
+    except (OSError, ValueError):
+        pass
+
+    columns, chunks = build()
+    try:
+        save_cache(path, sources, columns, chunks)
+    except OSError:
+        f = io.BytesIO()
+        write_cache(f, sources, columns, chunks)
+        return Cache(f.getvalue())
+
+    with open(path, "rb") as f:
+        return Cache(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
@@ -0,0 +1,381 @@
+"""
+Annotated corpora: a file of tokens plus, for each type of chunk (book,
+verse, sentence...), a file mapping chunks to ranges of tokens.
+
+The token file has a line per token with whitespace-separated `token_fields`
+and each chunk file a line per chunk with `chunk_id token_start token_end`
+(token ids are assumed to be sequential starting with 1), e.g.
+
+    corpus = Corpus(
+        "my_corpus",
+        "tokens.txt",
+        ["token_id", "text", "lemma"],
+        {"chapter": "chapters.txt", "sentence": "sentences.txt"},
+    )
+    corpus.get_tokens_by_chunk("lemma", "sentence")
+
+Token types and chunk types can be strings or enum members (whose `name` is
+used), and any number of corpora can be open at once. Each is compiled to its
+own memory-mapped cache (see `gnt_data.cache`) the first time it's needed and
+corpora over the same files share it.
+"""
+
+from collections.abc import Mapping
+import os.path
+from types import MappingProxyType
+import weakref
+
+from . import cache
+from .intervals import ChunkIndex
+from .records import TokenRecords
+
+# the caches already open, by path
+_open_caches = weakref.WeakValueDictionary()
+
+
+def type_name(type_):
+    """
+    the name a token or chunk type (a string or enum member) is stored under
+    """
+    return getattr(type_, "name", type_)
+
+
+class LazyDict(Mapping):
+    """
+    A read-only dictionary over the given `keys` whose value for each key is
+    only loaded (by calling `load` with the key) the first time it's needed.
+    """
+
+    def __init__(self, keys, load):
+        self._keys = list(keys)
+        self._load = load
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            if key not in self._keys:
+                raise
+            value = self._values[key] = self._load(key)
+            return value
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class ChunkData(Mapping):
+    """
+    A read-only dictionary mapping `(chunk_type, chunk_id)` to
+    `(token_start, token_end)` that only loads a chunk type when a chunk of
+    that type is first looked up.
+    """
+
+    def __init__(self, chunk_ids, chunk_ranges):
+        self._chunk_ids = chunk_ids
+        self._chunk_ranges = chunk_ranges
+
+    def __getitem__(self, key):
+        try:
+            chunk_type, chunk_id = key
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        return self._chunk_ranges[chunk_type][chunk_id]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __iter__(self):
+        for chunk_type in self._chunk_ids:
+            for chunk_id in self._chunk_ids[chunk_type]:
+                yield chunk_type, chunk_id
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._chunk_ids.values())
+
+
+class Corpus:
+    """
+    A corpus in `directory` made up of the token file `token_filename`, with
+    the given `token_fields`, and a chunk file for each chunk type in
+    `chunk_filenames` (a dictionary mapping each chunk type to a filename).
+
+    `derived_fields` maps the name of any extra token field to a function
+    computing its value from the dict of a token's fields (these are columns
+    but not part of the token dicts). `token_types` are the fields that can
+    be asked for as tokens (by default, all of them).
+
+    The compiled data is kept in `cache_filename` (by default named after the
+    token file), which is rebuilt whenever any of the files change.
+    """
+
+    def __init__(
+        self,
+        directory,
+        token_filename,
+        token_fields,
+        chunk_filenames,
+        derived_fields={},
+        token_types=None,
+        cache_filename=None,
+    ):
+        self.directory = directory
+        self.token_filename = token_filename
+        self.token_fields = list(token_fields)
+        self.chunk_filenames = dict(chunk_filenames)
+        self.derived_fields = dict(derived_fields)
+        if token_types is None:
+            token_types = self.token_fields + list(self.derived_fields)
+        self.token_types = list(token_types)
+        if cache_filename is None:
+            cache_filename = os.path.splitext(token_filename)[0] + ".cache"
+        self.cache_filename = cache_filename
+
+        self._data = None
+
+        # chunk_type -> [chunk_id]
+        self.chunk_ids = LazyDict(self.chunk_filenames, self._load_chunk_ids)
+        self.chunk_ranges = LazyDict(self.chunk_filenames, self._load_chunk_ranges)
+
+        # (chunk_type, chunk_id) -> (token_start, token_end)
+        self.chunk_data = ChunkData(self.chunk_ids, self.chunk_ranges)
+
+        # chunk_type -> ChunkIndex
+        self.chunk_index = LazyDict(self.chunk_filenames, self._load_chunk_index)
+
+        # token_type -> [token]
+        self.token_data = LazyDict(self.token_types, self._load_column)
+
+        # field -> [value]
+        self.token_columns = LazyDict(
+            self.token_fields + list(self.derived_fields), self._load_column
+        )
+
+        # token records behave like a list of a dict per token but are views
+        # over the token columns
+        self.token_dicts = TokenRecords(self.token_columns, self.token_fields)
+
+        # (token_type, chunk_type) -> {chunk_id: [tokens]}
+        self._tokens_by_chunk = {}
+
+    def __repr__(self):
+        return f"Corpus({self.directory!r}, {self.token_filename!r})"
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def parse_chunk_data(self):
+        """
+        Parse the chunk files into a dictionary mapping the name of each chunk
+        type to a list of `(chunk_id, token_start, token_end)`.
+        """
+        chunks = {}
+        for chunk_type, filename in self.chunk_filenames.items():
+            rows = chunks[type_name(chunk_type)] = []
+            with open(self.path(filename), encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        chunk_id, token_start, token_end = line.split()
+                        rows.append((chunk_id, int(token_start), int(token_end)))
+        return chunks
+
+    def parse_tokens(self):
+        """
+        Parse the token file into a dictionary mapping the name of each field
+        (including the derived fields) to a list with a value for each token.
+        """
+        columns = {name: [] for name in self.token_fields}
+        columns.update((name, []) for name in self.derived_fields)
+
+        with open(self.path(self.token_filename), encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+
+                # assume token_ids are sequential
+                for name, value in zip(self.token_fields, fields):
+                    columns[name].append(value)
+                if self.derived_fields:
+                    token = dict(zip(self.token_fields, fields))
+                    for name, derive in self.derived_fields.items():
+                        columns[name].append(derive(token))
+
+        return columns
+
+    def open_data(self):
+        """
+        Open the compiled cache of the token and chunk data, (re)building it
+        from the text files if they have changed. Corpora over the same cache
+        file share it while it's open.
+        """
+        path = os.path.realpath(self.path(self.cache_filename))
+        source_paths = [
+            self.path(filename)
+            for filename in [self.token_filename, *self.chunk_filenames.values()]
+        ]
+        data = _open_caches.get(path)
+        if data is None or data.header["sources"] != cache.source_signature(
+            source_paths
+        ):
+            data = _open_caches[path] = cache.open_cache(
+                path,
+                source_paths,
+                lambda: (self.parse_tokens(), self.parse_chunk_data()),
+            )
+        return data
+
+    def data(self):
+        """
+        the compiled token and chunk data, opened the first time it's needed
+        """
+        if self._data is None:
+            self._data = self.open_data()
+        return self._data
+
+    def _load_chunk_ids(self, chunk_type):
+        ids, starts, ends = self.data().chunk(type_name(chunk_type))
+        return ids
+
+    def _load_chunk_ranges(self, chunk_type):
+        ids, starts, ends = self.data().chunk(type_name(chunk_type))
+        return dict(zip(ids, zip(starts, ends)))
+
+    def _load_chunk_index(self, chunk_type):
+        return ChunkIndex(*self.data().chunk(type_name(chunk_type)))
+
+    def _load_column(self, name):
+        return self.data().column(type_name(name))
+
+    def get_tokens(self, token_type, chunk_type=None, chunk_id=None):
+        """
+        Return a list of tokens of the given `token_type` from the chunk of
+        type `chunk_type` with identifier `chunk_id`.
+
+        The list is a read-only view sharing the underlying token column
+        rather than a copy.
+
+        If `chunk_type` and `chunk_id` are omitted (they must both be if one
+        is) then all tokens are returned.
+        """
+
+        if chunk_type and chunk_id:
+            start, end = self.chunk_data[(chunk_type, chunk_id)]
+
+            # assume token_ids are sequential starting with 1
+            return self.token_data[token_type][start - 1 : end]  # noqa: E203
+
+        elif chunk_type is None and chunk_id is None:
+            return self.token_data[token_type]
+
+        else:
+            raise ValueError(
+                "either both or neither of chunk_type and chunk_id must be provided"
+            )
+
+    def get_token_dicts(self, chunk_type, chunk_id):
+        """
+        Return of list of dicts with all the token information from the chunk
+        of type `chunk_type` with identifier `chunk_id`.
+
+        The list is a `TokenRecords` view (and each dict a `TokenRecord` view)
+        over the token columns rather than a copy.
+        """
+        start, end = self.chunk_data[(chunk_type, chunk_id)]
+
+        # assume token_ids are sequential starting with 1
+        return self.token_dicts[start - 1 : end]  # noqa: E203
+
+    def get_tokens_by_chunk(self, token_type, chunk_type, condition=None, within=None):
+        """
+        Return a dictionary mapping the ids of chunks of the given
+        `chunk_type` to a list of tokens of the type `token_type` in that
+        chunk.
+
+        If `within` is given, as a `(chunk_type, chunk_id)` such as
+        `(ChunkType.book, "64")`, only the chunks lying within that chunk are
+        included (found with `chunk_index` rather than by checking every
+        chunk). If `condition` is given, only chunks whose id it returns true
+        for are included.
+
+        The lists are views over the token column (see `get_tokens`) and the
+        dictionary for each `token_type` and `chunk_type` is only built once,
+        so without a `condition` the result is a read-only view of that
+        dictionary.
+        """
+        if within is not None:
+            return {
+                chunk_id: self.get_tokens(token_type, chunk_type, chunk_id)
+                for chunk_id in self.chunks_within(chunk_type, *self.chunk_data[within])
+                if condition is None or condition(chunk_id)
+            }
+
+        key = (token_type, chunk_type)
+        tokens_by_chunk = self._tokens_by_chunk.get(key)
+        if tokens_by_chunk is None:
+            tokens_by_chunk = self._tokens_by_chunk[key] = {
+                chunk_id: self.get_tokens(token_type, chunk_type, chunk_id)
+                for chunk_id in self.chunk_ids[chunk_type]
+            }
+
+        if condition is None:
+            return MappingProxyType(tokens_by_chunk)
+
+        return {
+            chunk_id: tokens
+            for chunk_id, tokens in tokens_by_chunk.items()
+            if condition(chunk_id)
+        }
+
+    def chunks_containing(self, token_id, chunk_types=None):
+        """
+        Return a dictionary mapping each of `chunk_types` (by default, all of
+        them) to the id of the chunk of that type containing the token with
+        the given id (or None if there isn't one).
+
+        e.g. `chunks_containing(61813)[ChunkType.verse]` is the verse token
+        61813 is in
+        """
+        if chunk_types is None:
+            chunk_types = self.chunk_filenames
+        return {
+            chunk_type: self.chunk_index[chunk_type].chunk_containing(token_id)
+            for chunk_type in chunk_types
+        }
+
+    def chunks_within(self, chunk_type, start, end):
+        """
+        Return a list of the ids of the chunks of type `chunk_type` lying
+        entirely within the tokens from `start` to `end` (inclusive), in
+        order.
+        """
+        return self.chunk_index[chunk_type].within(start, end)
+
+    def chunks_with_prefix(self, chunk_type, prefix):
+        """
+        Return a list of the ids of the chunks of type `chunk_type` whose id
+        starts with `prefix`, in order.
+
+        e.g. `chunks_with_prefix(ChunkType.verse, "6418")` is the verses of
+        chapter 6418 (for the GNT's book, chapter, verse numbering)
+        """
+        return self.chunk_index[chunk_type].with_prefix(prefix)
+
+    def overlapping_chunks(self, chunk_type, chunk_id, other_type):
+        """
+        Return a list of the ids of the chunks of type `other_type` sharing
+        any tokens with the chunk of type `chunk_type` with identifier
+        `chunk_id`, in order.
+
+        e.g. `overlapping_chunks(ChunkType.sentence, "640301", ChunkType.verse)`
+        is the verses sentence 640301 is (at least partly) in
+        """
+        start, end = self.chunk_data[(chunk_type, chunk_id)]
+        return self.chunk_index[other_type].overlapping(start, end)
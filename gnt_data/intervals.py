@@ -0,0 +1,123 @@
+"""
+An index of the chunks of one type by the tokens they span, answering which
+chunk contains a token, or which chunks overlap or lie within a range of
+tokens, by binary search over the chunks' start tokens rather than a scan.
+
+Chunk ids also form a hierarchy (verse "641805" is in chapter "6418" of book
+"64") so chunks can be selected by id prefix the same way, by binary search
+over the sorted ids.
+"""
+
+from array import array
+import bisect
+import itertools
+
+# sorts after any character that can follow a prefix in an id
+MAX_CHARACTER = chr(0x10FFFF)
+
+
+class ChunkIndex:
+    """
+    An index over the chunks with the given `ids` spanning the tokens from
+    `starts` to `ends` (inclusive, as in the chunk files).
+
+    The chunks of a type normally follow each other without overlapping, in
+    which case a lookup is a single binary search and the sequences given
+    are used as they are (so the memory-mapped arrays of the compiled cache
+    aren't copied). Chunks that overlap or nest are handled too, at the cost
+    of also checking the earlier chunks that reach far enough.
+    """
+
+    def __init__(self, ids, starts, ends):
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            order = sorted(range(len(ids)), key=starts.__getitem__)
+            ids = [ids[i] for i in order]
+            starts = array("I", (starts[i] for i in order))
+            ends = array("I", (ends[i] for i in order))
+
+        self.ids = ids
+        self.starts = starts
+        self.ends = ends
+
+        # whether each chunk ends before the next starts
+        self.disjoint = all(ends[i] < starts[i + 1] for i in range(len(starts) - 1))
+
+        # the furthest token reached by any chunk up to each position, which
+        # bounds how far back a chunk overlapping a token can be (when the
+        # chunks are disjoint that's just the end of each)
+        if self.disjoint:
+            self.reach = ends
+        else:
+            self.reach = array("I", itertools.accumulate(ends, max))
+
+        # the ids in order, along with the position of each chunk in that
+        # order if it's not the order they're in already
+        if all(ids[i] <= ids[i + 1] for i in range(len(ids) - 1)):
+            self.id_order = None
+            self.sorted_ids = ids
+        else:
+            self.id_order = sorted(range(len(ids)), key=ids.__getitem__)
+            self.sorted_ids = [ids[p] for p in self.id_order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self, start, end):
+        """
+        generate the positions (latest first) of the chunks overlapping the
+        tokens from `start` to `end`
+        """
+        position = bisect.bisect_right(self.starts, end) - 1
+        while position >= 0 and self.reach[position] >= start:
+            if self.ends[position] >= start:
+                yield position
+            position -= 1
+
+    def chunk_containing(self, token_id):
+        """
+        the id of the chunk containing the given token (the one starting
+        latest if several do) or None if none does
+        """
+        for position in self._positions(token_id, token_id):
+            return self.ids[position]
+        return None
+
+    def chunks_containing(self, token_id):
+        """
+        a list of the ids of the chunks containing the given token, in order
+        """
+        return self.overlapping(token_id, token_id)
+
+    def overlapping(self, start, end):
+        """
+        a list of the ids of the chunks sharing any tokens with the range from
+        `start` to `end` (inclusive), in order
+        """
+        positions = list(self._positions(start, end))
+        return [self.ids[position] for position in reversed(positions)]
+
+    def within(self, start, end):
+        """
+        a list of the ids of the chunks lying entirely within the range of
+        tokens from `start` to `end` (inclusive), in order
+        """
+        first = bisect.bisect_left(self.starts, start)
+        last = bisect.bisect_right(self.starts, end)
+        if self.disjoint:
+            # the ends increase with the starts so only the last chunk
+            # starting in the range can end after it
+            if last > first and self.ends[last - 1] > end:
+                last -= 1
+            return self.ids[first:last]
+        return [self.ids[p] for p in range(first, last) if self.ends[p] <= end]
+
+    def with_prefix(self, prefix):
+        """
+        a list of the ids of the chunks whose id starts with `prefix` (e.g.
+        the verses of chapter "6418" are those starting "6418"), in order
+        """
+        first = bisect.bisect_left(self.sorted_ids, prefix)
+        last = bisect.bisect_left(self.sorted_ids, prefix + MAX_CHARACTER, first)
+        if self.id_order is None:
+            return self.ids[first:last]
+        return [self.ids[p] for p in sorted(self.id_order[first:last])]
@@ -1,6 +1,8 @@
 import enum
 import os.path
 
+from .corpus import Corpus
+
 ChunkType = enum.Enum("ChunkType", "book chapter verse sentence paragraph pericope")
 TokenType = enum.Enum("TokenType", "text form lemma hybrid")
 
@@ -14,60 +16,48 @@ chunk_data_filename = {
 }
 
 
-chunk_data = {}  # (chunk_type, chunk_id) -> (token_start, token_end)
-chunk_ids = {}  # chunk_type -> [chunk_id]
-
-
-def load_chunk_data():
-    for chunk_type, filename in chunk_data_filename.items():
-        chunk_ids[chunk_type] = []
-        with open(os.path.join(os.path.dirname(__file__), filename)) as f:
-            for line in f:
-                chunk_id, token_start, token_end = line.strip().split()
-                chunk_data[(chunk_type, chunk_id)] = (int(token_start), int(token_end))
-                chunk_ids[chunk_type].append(chunk_id)
-
-
-token_data = {}  # token_type -> [tokens]
-token_dicts = []  # [{}]
-
-def load_tokens():
-    for token_type in TokenType:
-        token_data[token_type] = []
-
-    with open(os.path.join(os.path.dirname(__file__), "tokens.txt")) as f:
-        for line in f:
-            token_id, text, form, pos, tag1, tag2, lemma = line.strip().split()
-
-            # assume token_ids are sequential
-            # token data is stored separately like this because all the
-            # initial applications involve just wanting one particular type of
-            # token at a time
-            token_data[TokenType.text].append(text)
-            token_data[TokenType.form].append(form)
-            token_data[TokenType.lemma].append(lemma)
-            if pos[0] == "R":
-                token_data[TokenType.hybrid].append(form)
-            elif lemma == "εἰμί":
-                token_data[TokenType.hybrid].append(form)
-            elif pos[0] == "V":
-                token_data[TokenType.hybrid].append(lemma + "_" + tag2[0])
-            else:
-                token_data[TokenType.hybrid].append(lemma)
-            # however token dicts are also stored
-            token_dicts.append({
-                "token_id": token_id,
-                "text": text,
-                "form": form,
-                "pos": pos,
-                "tag1": tag1,
-                "tag2": tag2,
-                "lemma": lemma,
-            })
-
-
-load_chunk_data()
-load_tokens()
+token_fields = ["token_id", "text", "form", "pos", "tag1", "tag2", "lemma"]
+
+cache_filename = "gnt_data.cache"
+
+
+def hybrid(token):
+    """
+    the form of prepositions and of εἰμί, the lemma and (first letter of the)
+    tense-voice-mood of other verbs and the lemma of everything else
+    """
+    if token["pos"][0] == "R":
+        return token["form"]
+    elif token["lemma"] == "εἰμί":
+        return token["form"]
+    elif token["pos"][0] == "V":
+        return token["lemma"] + "_" + token["tag2"][0]
+    else:
+        return token["lemma"]
+
+
+# the GNT as a `Corpus` (the functions below are shortcuts to its methods)
+gnt = Corpus(
+    os.path.dirname(__file__),
+    "tokens.txt",
+    token_fields,
+    chunk_data_filename,
+    derived_fields={TokenType.hybrid.name: hybrid},
+    token_types=TokenType,
+    cache_filename=cache_filename,
+)
+
+chunk_ids = gnt.chunk_ids  # chunk_type -> [chunk_id]
+chunk_data = gnt.chunk_data  # (chunk_type, chunk_id) -> (token_start, token_end)
+chunk_index = gnt.chunk_index  # chunk_type -> ChunkIndex
+
+# token data is stored separately like this because all the initial
+# applications involve just wanting one particular type of token at a time
+token_data = gnt.token_data
+
+# token records behave like a list of a dict per token but are views over the
+# token columns
+token_dicts = gnt.token_dicts  # [{}]
 
 
 def get_tokens(token_type, chunk_type=None, chunk_id=None):
@@ -75,26 +65,16 @@ def get_tokens(token_type, chunk_type=None, chunk_id=None):
     Return a list of tokens of the given `token_type` from the chunk of type
     `chunk_type` with identifier `chunk_id`.
 
+    The list is a read-only view sharing the underlying token column rather
+    than a copy.
+
     If `chunk_type` and `chunk_id` are omitted (they must both be if one is)
     then all tokens are returned.
 
     e.g. `get_tokens(TokenType.lemma, ChunkType.verse, "640316")` means
     "get the lemma tokens from verse 640316"
     """
-
-    if chunk_type and chunk_id:
-        start, end = chunk_data[(chunk_type, chunk_id)]
-
-        # assume token_ids are sequential starting with 1
-        return token_data[token_type][start - 1 : end]  # noqa: E203
-
-    elif chunk_type is None and chunk_id is None:
-        return token_data[token_type]
-
-    else:
-        raise ValueError(
-            "either both or neither of chunk_type and chunk_id must be provided"
-        )
+    return gnt.get_tokens(token_type, chunk_type, chunk_id)
 
 
 def get_token_dicts(chunk_type, chunk_id):
@@ -102,16 +82,16 @@ def get_token_dicts(chunk_type, chunk_id):
     Return of list of dicts with all the token information from the chunk of
     type `chunk_type` with identifier `chunk_id`.
 
+    The list is a `TokenRecords` view (and each dict a `TokenRecord` view)
+    over the token columns rather than a copy.
+
     e.g. `get_tokens(ChunkType.verse, "640316")` means "get all the token data
     for verse 640316"
     """
-    start, end = chunk_data[(chunk_type, chunk_id)]
+    return gnt.get_token_dicts(chunk_type, chunk_id)
 
-    # assume token_ids are sequential starting with 1
-    return token_dicts[start - 1 : end]  # noqa: E203
 
-
-def get_tokens_by_chunk(token_type, chunk_type, condition=lambda chunk_id: True):
+def get_tokens_by_chunk(token_type, chunk_type, condition=None, within=None):
     """
     Return a dictionary mapping the ids of chunks of the given `chunk_type` to
     a list of tokens of the type `token_type` in that chunk.
@@ -120,12 +100,62 @@ def get_tokens_by_chunk(token_type, chunk_type, condition=lambda chunk_id: True)
     a dictionary with an entry for each chapter where the key is the chapter
     identifier and the value is a list of lemmas (with repetitions if they
     exist)
+
+    If `condition` is given, only chunks whose id it returns true for are
+    included.
+
+    If `within` is given, only chunks within the chunk it identifies are
+    included, e.g. `within=(ChunkType.book, "64")` for the chunks of John
+    (which, unlike a `condition`, doesn't look at every chunk).
+
+    The lists are views over the token column (see `get_tokens`) and the
+    dictionary for each `token_type` and `chunk_type` is only built once, so
+    without a `condition` or `within` the result is a read-only view of that
+    dictionary.
+    """
+    return gnt.get_tokens_by_chunk(token_type, chunk_type, condition, within)
+
+
+def chunks_containing(token_id, chunk_types=None):
+    """
+    Return a dictionary mapping each of `chunk_types` (by default, every
+    `ChunkType`) to the id of the chunk of that type containing the token with
+    the given id.
+
+    e.g. `chunks_containing(61813)` means "get the book, chapter, verse,
+    sentence, paragraph and pericope token 61813 is in"
+    """
+    return gnt.chunks_containing(token_id, chunk_types)
+
+
+def chunks_within(chunk_type, start, end):
+    """
+    Return a list of the ids of the chunks of type `chunk_type` lying entirely
+    within the tokens from `start` to `end` (inclusive).
+    """
+    return gnt.chunks_within(chunk_type, start, end)
+
+
+def chunks_with_prefix(chunk_type, prefix):
+    """
+    Return a list of the ids of the chunks of type `chunk_type` whose id starts
+    with `prefix`.
+
+    e.g. `chunks_with_prefix(ChunkType.verse, "6418")` means "get the verses of
+    John 18"
+    """
+    return gnt.chunks_with_prefix(chunk_type, prefix)
+
+
+def overlapping_chunks(chunk_type, chunk_id, other_type):
+    """
+    Return a list of the ids of the chunks of type `other_type` sharing any
+    tokens with the chunk of type `chunk_type` with identifier `chunk_id`.
+
+    e.g. `overlapping_chunks(ChunkType.sentence, "640301", ChunkType.verse)`
+    means "get the verses sentence 640301 is (at least partly) in"
     """
-    return {
-        chunk_id: get_tokens(token_type, chunk_type, chunk_id)
-        for chunk_id in chunk_ids[chunk_type]
-        if condition(chunk_id)
-    }
+    return gnt.overlapping_chunks(chunk_type, chunk_id, other_type)
 
 
 # for quick testing
@@ -0,0 +1,95 @@
+from collections.abc import Mapping, Sequence
+
+
+class TokenRecord(Mapping):
+    """
+    A read-only view of the token at `index` in a `TokenRecords` that behaves
+    like the dict of its fields, so `t["lemma"]` works as it always has.
+    """
+
+    __slots__ = ("_columns", "_fields", "_index")
+
+    def __init__(self, columns, fields, index):
+        self._columns = columns
+        self._fields = fields
+        self._index = index
+
+    def __getitem__(self, field):
+        return self._columns[field][self._index]
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TokenRecords(Sequence):
+    """
+    A read-only list of token records over `columns` (a mapping from each of
+    `fields` to a sequence with a value per token) covering the tokens from
+    `start` up to (but not including) `stop`.
+
+    Indexing returns a `TokenRecord` and slicing returns another
+    `TokenRecords` over the same columns, so nothing is copied. Like the list
+    it replaces, it compares equal to a list (or other `TokenRecords`) of the
+    same records.
+    """
+
+    __slots__ = ("_columns", "_fields", "_start", "_stop")
+
+    def __init__(self, columns, fields, start=0, stop=None):
+        self._columns = columns
+        self._fields = fields
+        self._start = start
+        self._stop = stop
+
+    @property
+    def stop(self):
+        if self._stop is None:
+            self._stop = len(self._columns[self._fields[0]])
+        return self._stop
+
+    def __len__(self):
+        return self.stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            stop = max(start, stop)
+            return TokenRecords(
+                self._columns, self._fields, self._start + start, self._start + stop
+            )
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token record index out of range")
+        return TokenRecord(self._columns, self._fields, self._start + index)
+
+    def column(self, field):
+        """
+        the values of the given field for each of the tokens
+        """
+        return self._columns[field][self._start : self.stop]  # noqa: E203
+
+    def __eq__(self, other):
+        if isinstance(other, TokenRecords) and other._fields == self._fields:
+            # compare a column at a time rather than building every record
+            return len(self) == len(other) and all(
+                self.column(field) == other.column(field) for field in self._fields
+            )
+        if isinstance(other, (TokenRecords, list, tuple)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
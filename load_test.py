@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""
+A load test of the sequencing service (`sequencing_tools.service`).
+
+Simulates many learners at once, each creating themselves, then repeatedly
+asking for their next recommendations and reporting some vocabulary learnt
+elsewhere, while a probe checks how quickly the service still answers
+`/health` (which shows whether the event loop is being held up). Reports
+the latency of each kind of request:
+
+    ./load_test.py --learners 50 --rounds 5
+
+By default a service is started on a free local port for the test and
+stopped afterwards; use `--url` to test one that is already running.
+
+Run `./load_test.py --help` for all the options.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+class Connection:
+    """
+    A keep-alive HTTP/1.1 connection to the service.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """
+        return the status and the response parsed as JSON (or, for a streamed
+        response, a list of each line parsed as JSON)
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.writer.write(
+            (
+                f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+            ).encode("latin-1")
+            + data
+        )
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            lines = []
+            while True:
+                size = int(await self.reader.readline(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                lines.append(json.loads(chunk[:-2]))
+            return status, lines
+
+        content = await self.reader.readexactly(int(headers["content-length"]))
+        return status, json.loads(content)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def timed(latencies, name, coroutine):
+    start = time.perf_counter()
+    status, result = await coroutine
+    latencies[name].append(time.perf_counter() - start)
+    if status >= 400:
+        raise RuntimeError(f"{name} failed with {status}: {result}")
+    return result
+
+
+async def learner(host, port, args, latencies, rng):
+    connection = Connection(host, port)
+    try:
+        created = await timed(
+            latencies,
+            "create",
+            connection.request(
+                "POST",
+                "/learners",
+                {
+                    "strategy": rng.choice(args.strategies),
+                    "items": args.items,
+                    "targets": args.targets,
+                    "chunks": args.chunks,
+                },
+            ),
+        )
+        path = f"/learners/{created['learner']}"
+
+        learnt = []
+        for round in range(args.rounds):
+            steps = await timed(
+                latencies,
+                "next",
+                connection.request("POST", path + "/next", {"count": args.count}),
+            )
+            learnt.extend(item for step in steps for item in step["items_to_learn"])
+            if learnt:
+                await timed(
+                    latencies,
+                    "learn",
+                    connection.request(
+                        "POST", path + "/learn", {"items": rng.sample(learnt, 1)}
+                    ),
+                )
+            await timed(latencies, "describe", connection.request("GET", path))
+
+        await timed(latencies, "delete", connection.request("DELETE", path))
+    finally:
+        connection.close()
+
+
+async def probe(host, port, latencies, interval, done):
+    connection = Connection(host, port)
+    try:
+        while not done.is_set():
+            await timed(latencies, "health", connection.request("GET", "/health"))
+            await asyncio.sleep(interval)
+    finally:
+        connection.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(host, port, args):
+    latencies = collections.defaultdict(list)
+    rng = random.Random(args.seed)
+
+    # load the corpus before timing anything
+    warm_up = Connection(host, port)
+    await timed(
+        latencies,
+        "warm up",
+        warm_up.request(
+            "POST",
+            "/learners",
+            {"items": args.items, "targets": args.targets, "chunks": args.chunks},
+        ),
+    )
+    warm_up.close()
+    del latencies["warm up"]
+
+    done = asyncio.Event()
+    prober = asyncio.ensure_future(probe(host, port, latencies, args.probe, done))
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            learner(host, port, args, latencies, random.Random(rng.random()))
+            for i in range(args.learners)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+
+    requests = sum(
+        len(values) for name, values in latencies.items() if name != "health"
+    )
+    print(
+        f"{args.learners} learners, {requests} requests in {elapsed:.2f}s "
+        f"({requests / elapsed:.1f}/s)"
+    )
+    print("{:10s} {:>7s} {:>9s} {:>9s} {:>9s} {:>9s}".format(
+        "request", "count", "mean", "p50", "p95", "max"
+    ))
+    for name, values in latencies.items():
+        print("{:10s} {:>7d} {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms".format(
+            name,
+            len(values),
+            1000 * sum(values) / len(values),
+            1000 * percentile(values, 0.5),
+            1000 * percentile(values, 0.95),
+            1000 * max(values),
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--url", help="the service to test (default: start one for the test)"
+    )
+    parser.add_argument("--learners", type=int, default=20)
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=3,
+        help="the recommendations asked for per learner",
+    )
+    parser.add_argument(
+        "--count", type=int, default=1, help="the targets in each recommendation"
+    )
+    parser.add_argument(
+        "--strategies", nargs="+", default=["next_best", "frequency_optimised"]
+    )
+    parser.add_argument("--items", default="lemma")
+    parser.add_argument("--targets", default="verse")
+    parser.add_argument("--chunks", nargs="*", default=[], metavar="PREFIX")
+    parser.add_argument(
+        "--probe", type=float, default=0.05, help="seconds between health checks"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "sequencing_tools.service", "--port", "0"],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        url = urlsplit(process.stdout.readline().split()[-1])
+        host, port = url.hostname, url.port
+
+    try:
+        asyncio.run(run(host, port, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Sets of items stored as bits of a Python int.
+
+A `Vocabulary` interns items to dense integer ids and an `ItemSet` over it
+keeps the set of ids as a single int with bit `i` set for item `i`. Union,
+intersection, difference, counting and "are all of these known" checks are
+then a few operations on whole machine words rather than a loop over
+items, e.g.
+
+    vocabulary = Vocabulary(["λόγος", "θεός", "καί"])
+    known = ItemSet(vocabulary, ["καί"])
+    known.covers(["καί", "θεός"])  # False
+    known |= ItemSet(vocabulary, ["θεός"])
+    known.covers(["καί", "θεός"])  # True
+
+The helpers `mask`, `bits` and `popcount` work on the ints directly for
+code (like the strategies in `sequencing_tools.ordering`) that already has
+item ids.
+"""
+
+from collections.abc import MutableSet
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # before Python 3.10
+
+    def popcount(mask):
+        """
+        the number of bits set in the (non-negative) int `mask`
+        """
+        return bin(mask).count("1")
+
+
+def mask(ids):
+    """
+    the int with the bits for the given ids set
+    """
+    result = 0
+    for i in ids:
+        result |= 1 << i
+    return result
+
+
+def bits(mask):
+    """
+    generate the positions of the bits set in the (non-negative) int `mask`,
+    lowest first
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Vocabulary:
+    """
+    An interning of items to dense integer ids (in the order they are added)
+    for the `ItemSet`s over it. Any items given are added straight away.
+    """
+
+    def __init__(self, items=()):
+        self.items = []
+        self.index = {}
+        for item in items:
+            self.id(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def id(self, item):
+        """
+        the id of the given item, adding it if it's new
+        """
+        item_id = self.index.get(item)
+        if item_id is None:
+            item_id = self.index[item] = len(self.items)
+            self.items.append(item)
+        return item_id
+
+    def mask(self, items):
+        """
+        the int with the bits for the given items set, adding any that are
+        new
+        """
+        return mask(map(self.id, items))
+
+    def items_of(self, mask):
+        """
+        a list of the items whose bits are set in `mask`, in id order
+        """
+        ITEMS = self.items
+        return [ITEMS[i] for i in bits(mask)]
+
+
+class ItemSet(MutableSet):
+    """
+    A mutable set of items from `vocabulary` stored as the bits of the int
+    `mask`. It behaves like a `set` (items not yet in the vocabulary are
+    added to it when they are added to the set) and operations with another
+    `ItemSet` over the same vocabulary work a word at a time.
+    """
+
+    __slots__ = ("vocabulary", "mask")
+
+    def __init__(self, vocabulary, items=(), mask=0):
+        self.vocabulary = vocabulary
+        self.mask = mask | vocabulary.mask(items)
+
+    def _mask_of(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return other.mask
+        return self.vocabulary.mask(other)
+
+    def _from_iterable(self, items):
+        return ItemSet(self.vocabulary, items)
+
+    def __contains__(self, item):
+        item_id = self.vocabulary.index.get(item)
+        return item_id is not None and (self.mask >> item_id) & 1 == 1
+
+    def __iter__(self):
+        return iter(self.vocabulary.items_of(self.mask))
+
+    def __len__(self):
+        return popcount(self.mask)
+
+    def __repr__(self):
+        return f"ItemSet({self.vocabulary.items_of(self.mask)!r})"
+
+    def copy(self):
+        return ItemSet(self.vocabulary, mask=self.mask)
+
+    def add(self, item):
+        self.mask |= 1 << self.vocabulary.id(item)
+
+    def discard(self, item):
+        item_id = self.vocabulary.index.get(item)
+        if item_id is not None:
+            self.mask &= ~(1 << item_id)
+
+    def clear(self):
+        self.mask = 0
+
+    def update(self, items):
+        self.mask |= self._mask_of(items)
+
+    def covers(self, items):
+        """
+        whether all the given items are in the set (e.g. whether a target is
+        fully known)
+        """
+        if isinstance(items, ItemSet) and items.vocabulary is self.vocabulary:
+            return items.mask & ~self.mask == 0
+        index = self.vocabulary.index
+        wanted = 0
+        for item in items:
+            item_id = index.get(item)
+            if item_id is None:
+                return False
+            wanted |= 1 << item_id
+        return wanted & ~self.mask == 0
+
+    def missing(self, items):
+        """
+        an `ItemSet` of those of the given items not in the set
+        """
+        return ItemSet(self.vocabulary, mask=self._mask_of(items) & ~self.mask)
+
+    # word-level versions of the `set` operators for another `ItemSet`
+    # (anything else goes through the `MutableSet` defaults)
+
+    def __or__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return ItemSet(self.vocabulary, mask=self.mask | other.mask)
+        return super().__or__(other)
+
+    def __and__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return ItemSet(self.vocabulary, mask=self.mask & other.mask)
+        return super().__and__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return ItemSet(self.vocabulary, mask=self.mask & ~other.mask)
+        return super().__sub__(other)
+
+    def __ior__(self, other):
+        self.mask |= self._mask_of(other)
+        return self
+
+    def __iand__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            self.mask &= other.mask
+            return self
+        return super().__iand__(other)
+
+    def __isub__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            self.mask &= ~other.mask
+            return self
+        return super().__isub__(other)
+
+    def __le__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return self.mask & ~other.mask == 0
+        return super().__le__(other)
+
+    def __ge__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return other.mask & ~self.mask == 0
+        return super().__ge__(other)
+
+    def __eq__(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return self.mask == other.mask
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def isdisjoint(self, other):
+        if isinstance(other, ItemSet) and other.vocabulary is self.vocabulary:
+            return self.mask & other.mask == 0
+        return super().isdisjoint(other)
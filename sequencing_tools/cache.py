@@ -0,0 +1,388 @@
+"""
+A persistent cache of the orderings produced by the strategies in
+`sequencing_tools.ordering`.
+
+Each ordering is stored in its own file named by a hash of everything that
+determines it: the targets and their items, the strategy (and any extra
+arguments to it), `items_already_known`, `yield_already_known` and
+`targets_to_ignore`. So a cache hit can replay the `(target, items_to_learn)`
+sequence without running the strategy at all, e.g.
+
+    cache = OrderingCache()
+    for target, items_to_learn in cache.run(next_best, target_items, known):
+        ...
+
+or, as a drop-in replacement for the strategy itself,
+
+    next_best = cache.cached(ordering.next_best)
+
+A file is a short JSON header followed by a table of the distinct targets
+and items (one JSON value per line) and an array of integer codes into it
+giving, for each step, the target, the number of items to learn and the
+items. Once the files take up more than `max_bytes`, the least recently used
+are deleted.
+
+If the ordering isn't gone through to the end (e.g. with `islice`), the steps
+that were are stored as a partial ordering. A later run replays those and,
+only if more are wanted, runs the strategy again from the start to carry on
+past them, storing the longer ordering. That relies on the strategy giving
+the same ordering every time (as those in `sequencing_tools.ordering` do,
+whatever the hash seed), which is checked as the replayed steps are run
+again.
+
+Targets and items must be strings or numbers for an ordering to be stored
+(orderings of anything else are just run each time).
+"""
+
+from array import array
+import functools
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import weakref
+
+from .problem import Problem
+
+MAGIC = b"SQTO"
+VERSION = 2
+
+# magic, version, header length
+PREAMBLE = struct.Struct("<4sII")
+
+SUFFIX = ".order"
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# the digests of problems already hashed
+_problem_digests = weakref.WeakKeyDictionary()
+
+
+def default_directory():
+    """
+    `$SEQUENCING_TOOLS_CACHE` if set, otherwise `~/.cache/sequencing_tools`
+    """
+    return os.environ.get("SEQUENCING_TOOLS_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "sequencing_tools"
+    )
+
+
+def target_items_digest(target_items):
+    """
+    a hash of the targets and their items (in order, with repetitions), which
+    is the same for a `target_items` dictionary and a `Problem` compiled
+    from it
+    """
+    if isinstance(target_items, Problem):
+        digest = _problem_digests.get(target_items)
+        if digest is None:
+            ITEMS = target_items.items
+            digest = _problem_digests[target_items] = _digest(
+                (target, [ITEMS[item] for item in target_items.tokens_of(target_id)])
+                for target_id, target in enumerate(target_items.targets)
+            )
+        return digest
+    return _digest(target_items.items())
+
+
+def _digest(target_items):
+    sha = hashlib.sha256()
+    for target, items in target_items:
+        sha.update(
+            json.dumps([target, list(items)], ensure_ascii=False).encode("utf-8")
+        )
+        sha.update(b"\n")
+    return sha.hexdigest()
+
+
+def ordering_key(
+    strategy,
+    target_items,
+    items_already_known=set(),
+    yield_already_known=False,
+    targets_to_ignore=set(),
+    **kwargs,
+):
+    """
+    the key an ordering is cached under: a hash of everything it depends on
+    (which doesn't include a `trace`)
+    """
+    kwargs.pop("trace", None)
+    description = {
+        "version": VERSION,
+        "strategy": f"{strategy.__module__}.{strategy.__qualname__}",
+        "kwargs": sorted(kwargs.items()),
+        "target_items": target_items_digest(target_items),
+        "items_already_known": sorted(items_already_known),
+        "yield_already_known": bool(yield_already_known),
+        "targets_to_ignore": sorted(targets_to_ignore),
+    }
+    return hashlib.sha256(
+        json.dumps(description, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+# the types of target and item that can be stored (and read back as the same
+# type)
+VALUE_TYPES = (str, int, float)
+
+
+def write_ordering(f, steps, complete=True):
+    """
+    write the `(target, items_to_learn)` pairs of `steps` to the binary file
+    object `f`, marked as the whole ordering or (if not `complete`) just the
+    start of it
+
+    Raises TypeError if a target or item isn't a string or number.
+    """
+    # keyed by type too so that, e.g., 1 and 1.0 are kept apart
+    index = {}
+    codes = array("I")
+
+    def code(value):
+        key = (type(value), value)
+        if key not in index:
+            if not isinstance(value, VALUE_TYPES) or isinstance(value, bool):
+                raise TypeError(
+                    f"can't store {type(value).__name__} {value!r} in an ordering"
+                )
+            index[key] = len(index)
+        return index[key]
+
+    count = 0
+    for target, items_to_learn in steps:
+        codes.append(code(target))
+        codes.append(len(items_to_learn))
+        codes.extend(code(item) for item in items_to_learn)
+        count += 1
+
+    strings = "\n".join(
+        json.dumps(value, ensure_ascii=False) for value_type, value in index
+    ).encode("utf-8")
+    header = json.dumps(
+        {
+            "steps": count,
+            "complete": complete,
+            "strings": len(index),
+            "strings_length": len(strings),
+        }
+    ).encode("utf-8")
+    header += b" " * (-(PREAMBLE.size + len(header) + len(strings)) % codes.itemsize)
+
+    f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+    f.write(header)
+    f.write(strings)
+    f.write(codes.tobytes())
+
+
+def read_ordering(data):
+    """
+    an iterator over the `(target, items_to_learn)` pairs stored in the bytes
+    `data` and whether they are the whole ordering (raising ValueError straight
+    away if it isn't an ordering)
+    """
+    magic, version, header_length = PREAMBLE.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not an ordering cache file of this version")
+    view = memoryview(data)
+    start = PREAMBLE.size + header_length
+    header = json.loads(bytes(view[PREAMBLE.size : start]))  # noqa: E203
+    end = start + header["strings_length"]
+    lines = str(view[start:end], "utf-8").split("\n") if header["strings"] else []
+    table = [json.loads(line) for line in lines]
+    return _replay(header["steps"], table, view[end:].cast("I")), header["complete"]
+
+
+def _replay(steps, table, codes):
+    position = 0
+    for step in range(steps):
+        target = table[codes[position]]
+        count = codes[position + 1]
+        position += 2
+        items = codes[position : position + count]  # noqa: E203
+        position += count
+        yield target, {table[item] for item in items}
+
+
+class OrderingCache:
+    """
+    A directory of cached orderings taking up at most about `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key):
+        """
+        the stored `(target, items_to_learn)` pairs for `key` as a generator
+        and whether they are the whole ordering, or None if there are none
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            stored = read_ordering(data)
+            # mark as recently used
+            os.utime(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        return stored
+
+    def store(self, key, steps, complete=True):
+        """
+        store the `(target, items_to_learn)` pairs `steps` under `key` (via a
+        temporary file moved into place so a reader never sees a partially
+        written ordering) and then evict the least recently used orderings
+
+        If not `complete`, the steps are only the start of the ordering.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_ordering(f, steps, complete)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        a list of `(last used, size, path)` for each cached ordering
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        delete the least recently used orderings until the rest fit in
+        `max_bytes`
+        """
+        entries = sorted(self.entries())
+        total = sum(size for last_used, size, path in entries)
+        for last_used, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+    def remove(self, key):
+        """
+        forget the ordering stored under `key`, if any
+        """
+        try:
+            os.unlink(self.path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for last_used, size, path in self.entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def run(
+        self,
+        strategy,
+        target_items,
+        items_already_known=set(),
+        yield_already_known=False,
+        targets_to_ignore=set(),
+        **kwargs,
+    ):
+        """
+        Generate what `strategy` would for the given arguments, replaying it
+        from the cache if it has been run with them before. Otherwise the
+        strategy is run and its output stored for next time, whether it is
+        gone through to the end or not (when it is stored as a partial
+        ordering a later run can carry on from).
+
+        Raises RuntimeError (and forgets the partial ordering) if carrying on
+        from a partial ordering finds the strategy doesn't repeat it.
+        """
+        key = ordering_key(
+            strategy,
+            target_items,
+            items_already_known,
+            yield_already_known,
+            targets_to_ignore,
+            **kwargs,
+        )
+
+        stored = self.load(key)
+        if stored is not None and stored[1]:
+            yield from stored[0]
+            return
+
+        # a partial ordering is replayed before running the strategy (from the
+        # start, skipping what was replayed) only if more steps are wanted
+        recorded = []
+        if stored is not None:
+            for target, items_to_learn in stored[0]:
+                recorded.append((target, items_to_learn))
+                yield target, items_to_learn
+        replayed = len(recorded)
+
+        complete = False
+        try:
+            steps = strategy(
+                target_items,
+                items_already_known,
+                yield_already_known,
+                targets_to_ignore,
+                **kwargs,
+            )
+            for step in range(replayed):
+                target, items_to_learn = next(steps, (None, None))
+                if (target, items_to_learn) != recorded[step]:
+                    self.remove(key)
+                    raise RuntimeError(
+                        f"{strategy.__qualname__} didn't repeat step {step} of "
+                        "the partial ordering cached for it, so can't carry on "
+                        "from it"
+                    )
+            for target, items_to_learn in steps:
+                recorded.append((target, items_to_learn))
+                yield target, items_to_learn
+            complete = True
+        finally:
+            # also when stopped early (the generator being closed)
+            if complete or len(recorded) > replayed:
+                try:
+                    self.store(key, recorded, complete)
+                except (OSError, TypeError):
+                    pass
+
+    def cached(self, strategy):
+        """
+        a version of `strategy` that goes through this cache
+        """
+
+        @functools.wraps(strategy)
+        def cached_strategy(target_items, *args, **kwargs):
+            return self.run(strategy, target_items, *args, **kwargs)
+
+        return cached_strategy
@@ -1,7 +1,91 @@
+from array import array
+import bisect
 import collections
+import itertools
 import math
 
 
+class Frequencies:
+    """
+    A Counter compiled into arrays over an interned vocabulary so the
+    statistics below can be computed with cumulative sums and binary searches
+    rather than by walking `most_common()` each time.
+
+    `items` is the vocabulary from most to least frequent (ties in
+    `most_common()` order), `counts` the count of each and `cumulative` the
+    running total of `counts`.
+
+    Any of the functions below taking a `counter` can be given a
+    `Frequencies` instead, which saves compiling it again when computing
+    several statistics over the same counts.
+    """
+
+    def __init__(self, counter):
+        self.items = []
+        self.counts = array("q")
+        for item, count in counter.most_common():
+            self.items.append(item)
+            self.counts.append(count)
+        self.cumulative = array("q", itertools.accumulate(self.counts))
+        self.total = self.cumulative[-1] if self.cumulative else 0
+
+        # the counts negated so they are ascending and can be binary searched
+        self._descending = array("q", (-count for count in self.counts))
+
+    def __len__(self):
+        return len(self.items)
+
+    def count_above(self, count):
+        """
+        the number of items occurring more than `count` times
+        """
+        return bisect.bisect_left(self._descending, -count)
+
+    def count_at_least(self, count):
+        """
+        the number of items occurring at least `count` times
+        """
+        return bisect.bisect_right(self._descending, -count)
+
+    def first_cumulative(self, condition, lo=0):
+        """
+        the first index from `lo` at which `condition` is true of the
+        cumulative count (which must be false then true as it grows), or the
+        number of items if there is no such index
+        """
+        hi = len(self.cumulative)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if condition(self.cumulative[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def ranks(self):
+        """
+        the rank (with ties) of each item in `items`
+        """
+        ranks = array("q", bytes(8 * len(self.counts)))
+        rank = 0
+        previous = None
+        for i, count in enumerate(self.counts):
+            if count != previous:
+                rank = i + 1
+                previous = count
+            ranks[i] = rank
+        return ranks
+
+
+def frequencies(counter):
+    """
+    Return `counter` as `Frequencies`, compiling it if it is a Counter.
+    """
+    if isinstance(counter, Frequencies):
+        return counter
+    return Frequencies(counter)
+
+
 def tokens_for_coverage(counter, limit):
     """
     Return a counter over the highest frequency tokens in the given `counter`
@@ -12,39 +96,87 @@ def tokens_for_coverage(counter, limit):
     will return the Core 50% GNT Vocabulary (by lemma).
     """
 
-    total_item_count = sum(counter.values())
-    count_limit = total_item_count * limit
+    freqs = frequencies(counter)
+    count_limit = freqs.total * limit
 
-    cumulative_count = 0
-    min_count = 0
+    # everything up to the first item taking the coverage past the limit...
+    end = bisect.bisect_right(freqs.cumulative, count_limit)
 
-    sub_counter = collections.Counter()
+    # ...plus any other items with the same count
+    if end < len(freqs):
+        end = freqs.count_at_least(freqs.counts[end])
 
-    for token, count in counter.most_common():
-        if count < min_count:
-            break
-        sub_counter[token] += count
-        cumulative_count += count
-        if cumulative_count > count_limit:
-            min_count = count
+    return collections.Counter(dict(zip(freqs.items[:end], freqs.counts[:end])))
 
-    return sub_counter
 
+def coverage_table(overall_items, items_by_target, COVERAGE, ITEM_COUNTS):
+    """
+    Return a dictionary mapping each item count in `ITEM_COUNTS` to a
+    dictionary mapping each coverage in `COVERAGE` to the proportion of
+    targets in `items_by_target` that are covered to at least that proportion
+    by the item count most frequent items in `overall_items`.
 
-def print_coverage_table(overall_items, items_by_target, COVERAGE, ITEM_COUNTS):
-    ranked_items = {x[0]: i for i, x in enumerate(overall_items.most_common(), 1)}
+    An item count of `None` means all the items.
+
+    e.g. `coverage_table(Counter(lemmas), lemmas_by_verse, [0.9], [100])`
+    might be `{100: {0.9: 0.0243}}`, meaning 2.43% of verses have at least
+    90% of their lemmas in the top 100.
 
-    rank_list_per_chunk = {
-        target: sorted([ranked_items[item] for item in items])
-        for target, items in items_by_target.items()
+    The ranks needed by all the targets to reach each coverage are gathered
+    into a cumulative histogram once so each cell is then a lookup.
+    """
+    ranked_items = {
+        item: i for i, item in enumerate(frequencies(overall_items).items, 1)
     }
 
-    lowest_rank_needed = {}
+    # the targets grouped by length, and for each length the rank needed at
+    # each position of the sorted rank lists, so every target of a given
+    # length needs the rank at the same position to reach a given coverage
+    rank_columns_by_length = collections.defaultdict(list)
+    for items in items_by_target.values():
+        rank_columns_by_length[len(items)].append(
+            sorted([ranked_items[item] for item in items])
+        )
+    for length, rank_lists in rank_columns_by_length.items():
+        rank_columns_by_length[length] = list(zip(*rank_lists))
+
+    target_count = len(items_by_target)
+
+    # item counts beyond the number of items (or below 0) cover the same as
+    # all items (or none)
+    limits = [
+        len(ranked_items) if item_count is None else item_count
+        for item_count in ITEM_COUNTS
+    ]
+    limits = [min(max(int(limit), 0), len(ranked_items)) for limit in limits]
+    ranks = range(len(ranked_items) + 1)
+
+    columns = []
     for coverage in COVERAGE:
-        lowest_rank_needed[coverage] = {
-            target:rank_list[math.ceil(coverage * len(rank_list)) - 1]
-            for target, rank_list in rank_list_per_chunk.items()
-        }
+        lowest_rank_needed = collections.Counter(
+            itertools.chain.from_iterable(
+                rank_columns[math.ceil(coverage * length) - 1]
+                for length, rank_columns in rank_columns_by_length.items()
+            )
+        )
+        # the number of targets covered with each number of items
+        covered = list(
+            itertools.accumulate(
+                map(lowest_rank_needed.get, ranks, itertools.repeat(0))
+            )
+        )
+        columns.append([covered[limit] / target_count for limit in limits])
+
+    return {
+        item_count: dict(zip(COVERAGE, row))
+        for item_count, row in zip(ITEM_COUNTS, zip(*columns))
+    }
+
+
+def print_coverage_table(overall_items, items_by_target, COVERAGE, ITEM_COUNTS):
+    table = coverage_table(
+        overall_items, items_by_target, COVERAGE, list(ITEM_COUNTS) + [None]
+    )
 
     print("{:7s}".format(""), end="")
     for coverage in COVERAGE:
@@ -55,14 +187,12 @@ def print_coverage_table(overall_items, items_by_target, COVERAGE, ITEM_COUNTS):
     for item_count in ITEM_COUNTS:
         print("{:7d}".format(item_count), end="")
         for coverage in COVERAGE:
-            num = len([freq for freq in lowest_rank_needed[coverage].values() if freq <= item_count])
-            print("{:10.2%}".format(num / len(rank_list_per_chunk)), end="")
+            print("{:10.2%}".format(table[item_count][coverage]), end="")
         print()
 
     print("{:>7s}".format("ALL"), end="")
     for coverage in COVERAGE:
-        num = len([freq for freq in lowest_rank_needed[coverage].values() if freq <= len(ranked_items)])
-        print("{:10.2%}".format(num / len(rank_list_per_chunk)), end="")
+        print("{:10.2%}".format(table[None][coverage]), end="")
     print()
 
 
@@ -77,17 +207,19 @@ def rank_with_ties(counter):
     ranks are skipped if there are ties (you might get 1, 2, 2, 4 for example).
     """
 
+    freqs = frequencies(counter)
+    ranks = freqs.ranks()
+
     item_rank = {}
-    prev_count = math.inf  # == no previous
-    inc1 = 0  # this goes up with each item
-    inc2 = 0  # this is set to inc1 whenever the next item has a lower count
 
-    for count, item in sorted(((count, item) for item, count in counter.items()), reverse=True):
-        inc1 += 1
-        if count < prev_count:
-            inc2 = inc1
-            prev_count = count
-        item_rank[item] = inc2
+    # items of the same rank are listed in reverse order as if sorted by
+    # (count, item) descending
+    start = 0
+    while start < len(freqs):
+        end = freqs.count_at_least(freqs.counts[start])
+        for item in sorted(freqs.items[start:end], reverse=True):
+            item_rank[item] = ranks[start]
+        start = end
 
     return item_rank
 
@@ -105,33 +237,30 @@ def print_tier_summary(counter, perc_tiers, count_tiers):
     The 73.52% point is reached at 500 lemmas (104 occurrences at that point)
     ```
     """
-    TOTAL = sum(counter.values())
-    cumulative = 0
-    tiers = perc_tiers[:]
+    freqs = frequencies(counter)
+    TOTAL = freqs.total
+
+    # at most one tier is reached per lemma so a tier reached at the same
+    # lemma as the previous one is reported at the next lemma
     i = 0
-    for lemma, count in counter.most_common():
-        if not tiers:
+    for tier in perc_tiers:
+        i = freqs.first_cumulative(lambda cum: 100 * cum / TOTAL >= tier, i)
+        if i == len(freqs):
             break
+        count = freqs.counts[i]
         i += 1
-        cumulative += count
-        if 100 * cumulative / TOTAL >= tiers[0]:
-            print(f"The {tiers[0]}% point is reached at {i} lemmas ({count} occurrences at that point)")
-            tiers = tiers[1:]
+        print(f"The {tier}% point is reached at {i} lemmas ({count} occurrences at that point)")
 
     print("---")
 
-    TOTAL = sum(counter.values())
-    cumulative = 0
-    tiers = count_tiers[:]
     i = 0
-    for lemma, count in counter.most_common():
-        if not tiers:
+    for tier in count_tiers:
+        i = max(i + 1, tier)
+        if i > len(freqs):
             break
-        i += 1
-        cumulative += count
-        if i >= tiers[0]:
-            print(f"The {round(100 * cumulative / TOTAL, 2):.02f}% point is reached at {i} lemmas ({count} occurrences at that point)")
-            tiers = tiers[1:]
+        cumulative = freqs.cumulative[i - 1]
+        count = freqs.counts[i - 1]
+        print(f"The {round(100 * cumulative / TOTAL, 2):.02f}% point is reached at {i} lemmas ({count} occurrences at that point)")
     print(f"{TOTAL} tokens")
 
 
@@ -143,14 +272,14 @@ def cumulative_frequency(counter, limit=None):
     e.g. {'ὁ' 0.1339, 'καί' 0.1868, 'δέ' 0.2187, 'εἰμί' 0.2381, 'αὐτός' 0.2542}
     """
 
-    total = sum(counter.values())
-    cumulative = 0
-    cumfreq_dict = {}
-    for lemma, count in counter.most_common(limit):
-        cumulative += count
-        cumfreq_dict[lemma] = cumulative / total
+    freqs = frequencies(counter)
+    end = len(freqs) if limit is None else min(limit, len(freqs))
+    total = freqs.total
 
-    return cumfreq_dict
+    return {
+        lemma: cumulative / total
+        for lemma, cumulative in zip(freqs.items[:end], freqs.cumulative[:end])
+    }
 
 
 def log_rank_differences(counter1, counter2):
@@ -158,10 +287,12 @@ def log_rank_differences(counter1, counter2):
     given two Counters, calculate the log2 rank of each lemma and return a list
     of lemmas sorted by difference.
     """
-    s1 = set(counter1)
-    s2 = set(counter2)
-    r1 = rank_with_ties(counter1)
-    r2 = rank_with_ties(counter2)
+    freqs1 = frequencies(counter1)
+    freqs2 = frequencies(counter2)
+    s1 = set(freqs1.items)
+    s2 = set(freqs2.items)
+    r1 = dict(zip(freqs1.items, freqs1.ranks()))
+    r2 = dict(zip(freqs2.items, freqs2.ranks()))
 
     return {
         lemma: abs(math.log2(r1[lemma]) - math.log2(r2[lemma]))
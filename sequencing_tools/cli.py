@@ -0,0 +1,167 @@
+"""
+The `sequencing-tools` command.
+
+Orders the targets of a `gnt_data` corpus with one of the strategies in
+`sequencing_tools.ordering`, writing a JSON object per target to stdout as
+each is yielded, e.g.
+
+    sequencing-tools next_best --items lemma --targets verse --chunks 64 \\
+        --known known.txt --limit 10
+
+Each line is `{"target": ..., "items_to_learn": [...]}`. Only the modules the
+chosen options need are imported, so the first lines appear as soon as the
+strategy yields them.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+
+STRATEGIES = ["frequency", "frequency_optimised", "next_best", "next_best_approximate"]
+
+
+def read_lines(path):
+    """
+    the set of non-blank lines (stripped) of the file at `path` (or stdin if
+    `path` is `-`), ignoring lines starting with `#`
+    """
+    if path == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    return {
+        line.strip() for line in lines if line.strip() and not line.startswith("#")
+    }
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog="sequencing-tools",
+        description="order the targets of a GNT corpus, one JSON object per line",
+    )
+    parser.add_argument("strategy", nargs="?", default="next_best", choices=STRATEGIES)
+    parser.add_argument(
+        "--items", default="lemma", help="the gnt_data TokenType to use as items"
+    )
+    parser.add_argument(
+        "--targets", default="verse", help="the gnt_data ChunkType to use as targets"
+    )
+    parser.add_argument(
+        "--chunks",
+        nargs="+",
+        metavar="PREFIX",
+        help="only use targets whose chunk id starts with one of these (e.g. 64)",
+    )
+    parser.add_argument(
+        "--known", metavar="FILE", help="a file of items already known, one per line"
+    )
+    parser.add_argument(
+        "--ignore", metavar="FILE", help="a file of targets to ignore, one per line"
+    )
+    parser.add_argument(
+        "--yield-known",
+        action="store_true",
+        help="start with the targets readable with the known items alone",
+    )
+    parser.add_argument("--limit", type=int, help="stop after this many targets")
+    parser.add_argument(
+        "--cutoff",
+        type=int,
+        default=10,
+        help="the missing-item cutoff for next_best_approximate",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const="",
+        metavar="DIR",
+        help="replay (or save) the ordering from a cache (by default in "
+        "$SEQUENCING_TOOLS_CACHE or ~/.cache/sequencing_tools)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write per-step timings and counts to this CSV file (not with --cache)",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.trace and args.cache is not None:
+        sys.exit("sequencing-tools: --trace can't be used with --cache")
+
+    from gnt_data import (
+        ChunkType,
+        TokenType,
+        chunk_data,
+        chunks_with_prefix,
+        get_tokens,
+        get_tokens_by_chunk,
+    )
+
+    for names, name in [(TokenType, args.items), (ChunkType, args.targets)]:
+        if name not in names.__members__:
+            sys.exit(
+                f"sequencing-tools: unknown {names.__name__} {name!r} "
+                f"(choose from {', '.join(names.__members__)})"
+            )
+    token_type = TokenType[args.items]
+    chunk_type = ChunkType[args.targets]
+
+    if args.chunks:
+        # the chunks with each prefix are looked up in the chunk index rather
+        # than checking every chunk id, then put back in corpus order
+        chunk_ids = {
+            chunk_id
+            for prefix in args.chunks
+            for chunk_id in chunks_with_prefix(chunk_type, prefix)
+        }
+        target_items = {
+            chunk_id: get_tokens(token_type, chunk_type, chunk_id)
+            for chunk_id in sorted(
+                chunk_ids, key=lambda chunk_id: chunk_data[(chunk_type, chunk_id)]
+            )
+        }
+    else:
+        target_items = get_tokens_by_chunk(token_type, chunk_type)
+    known = read_lines(args.known) if args.known else set()
+    ignore = read_lines(args.ignore) if args.ignore else set()
+
+    from . import ordering
+
+    strategy = getattr(ordering, args.strategy)
+    kwargs = {}
+    if args.strategy == "next_best_approximate":
+        kwargs["cutoff"] = args.cutoff
+    if args.trace:
+        from .trace import Trace
+
+        kwargs["trace"] = trace = Trace()
+
+    if args.cache is not None:
+        from .cache import OrderingCache
+
+        steps = OrderingCache(args.cache or None).run(
+            strategy, target_items, known, args.yield_known, ignore, **kwargs
+        )
+    else:
+        steps = strategy(target_items, known, args.yield_known, ignore, **kwargs)
+
+    try:
+        for target, items_to_learn in itertools.islice(steps, args.limit):
+            record = {"target": target, "items_to_learn": sorted(items_to_learn)}
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # the reader (e.g. `head`) has stopped so stop too, quietly
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if args.trace:
+            with open(args.trace, "w", encoding="utf-8", newline="") as f:
+                trace.write_csv(f)
@@ -0,0 +1,145 @@
+"""
+Streaming ingestion of corpora into the target/item form the strategies in
+`sequencing_tools.ordering` consume.
+
+Each stage is a generator so a corpus is read a line at a time and only the
+items of the chunk currently being built are held in memory, e.g.
+
+    with open("tokens.txt") as f:
+        chunks = chunk_by(read_tsv(f), lambda token: token["token_id"][:6])
+        target_items, item_counts = ingest(chunks, "lemma")
+
+or, for plain text split into sentences:
+
+    with open("text.txt") as f:
+        target_items, item_counts = ingest(chunk_by_sentence(read_text(f)), "form")
+"""
+
+import collections
+import itertools
+import sys
+import unicodedata
+
+# the columns of `gnt_data/tokens.txt`
+TOKEN_FIELDS = ("token_id", "text", "form", "pos", "tag1", "tag2", "lemma")
+
+SENTENCE_END = ".;·?!"
+
+
+def read_tsv(lines, fields=TOKEN_FIELDS):
+    """
+    Generate a dict per line of `lines` (e.g. an open file) mapping each of
+    `fields` to the corresponding whitespace-separated column. Blank lines
+    are skipped.
+    """
+    for line in lines:
+        values = line.split()
+        if values:
+            yield dict(zip(fields, values))
+
+
+def normalise(word):
+    """
+    strip punctuation from the ends of `word` and lowercase it
+    """
+    start = 0
+    end = len(word)
+    while start < end and unicodedata.category(word[start])[0] == "P":
+        start += 1
+    while end > start and unicodedata.category(word[end - 1])[0] == "P":
+        end -= 1
+    return unicodedata.normalize("NFC", word[start:end].lower())
+
+
+def read_text(lines):
+    """
+    Generate a dict per whitespace-separated word of plain text `lines` (e.g.
+    an open file) with the `text` of the word as it appears, its normalised
+    `form` (see `normalise`) and the `line` number (from 1) it is on. Words
+    that are only punctuation are skipped.
+    """
+    for line_number, line in enumerate(lines, 1):
+        for text in line.split():
+            form = normalise(text)
+            if form:
+                yield {"text": text, "form": form, "line": line_number}
+
+
+def chunk_by(tokens, key):
+    """
+    Generate `(chunk_id, tokens)` for each run of consecutive `tokens` for
+    which `key(token)` gives the same chunk id.
+    """
+    for chunk_id, chunk in itertools.groupby(tokens, key):
+        yield chunk_id, chunk
+
+
+def chunk_by_sentence(tokens, end=SENTENCE_END):
+    """
+    Generate `(chunk_id, tokens)` for each sentence of `tokens` (numbered
+    from 1), a sentence ending with any token whose `text` ends with one of
+    the characters in `end`.
+    """
+    chunk_id = 1
+    chunk = []
+    for token in tokens:
+        chunk.append(token)
+        if token["text"][-1] in end:
+            yield chunk_id, chunk
+            chunk_id += 1
+            chunk = []
+    if chunk:
+        yield chunk_id, chunk
+
+
+def chunk_by_size(tokens, size):
+    """
+    Generate `(chunk_id, tokens)` for each run of `size` tokens (numbered
+    from 1).
+    """
+    tokens = iter(tokens)
+    for chunk_id in itertools.count(1):
+        chunk = list(itertools.islice(tokens, size))
+        if not chunk:
+            break
+        yield chunk_id, chunk
+
+
+def target_items(chunks, item):
+    """
+    Generate `(target, items)` for each of `chunks` where `items` is the list
+    of items (with repetitions) for the tokens in the chunk.
+
+    `item` is either the name of the token field to use as the item or a
+    function taking a token and returning its item. Item strings are
+    interned so each distinct item is only stored once however many targets
+    it appears in.
+    """
+    if isinstance(item, str):
+        field = item
+
+        def item(token):
+            return token[field]
+
+    for target, tokens in chunks:
+        yield target, [sys.intern(item(token)) for token in tokens]
+
+
+def ingest(chunks, item):
+    """
+    Consume `chunks` (see `target_items`), returning the `target_items`
+    dictionary mapping each target to its items and a Counter of how many
+    times each item occurs.
+
+    Only the mapping and the counts are kept; the tokens themselves are
+    discarded as soon as their chunk has been read. For the most compact
+    form pass `target_items(chunks, item)` to
+    `sequencing_tools.problem.Problem` instead, which stores the items as
+    arrays of ids.
+    """
+    mapping = {}
+    counter = collections.Counter()
+    for target, items in target_items(chunks, item):
+        mapping[target] = items
+        counter.update(items)
+    return mapping, counter
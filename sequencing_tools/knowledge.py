@@ -0,0 +1,320 @@
+"""
+Graded models of how well learners know each item.
+
+Rather than an item simply being known or not (as in `LearningModel`), each
+learner has a strength from 0 to 1 for each item of an interned
+`sequencing_tools.bitset.Vocabulary`. Reading reinforces the items read
+
+    strength = 1 - (1 - strength) * (1 - reinforcement) ** occurrences
+
+and each step of reading (each call to `read`) the strength of every item
+decays
+
+    strength = strength * (1 - decay)
+
+An item is known at a given `threshold` if its strength is at least that.
+
+A `Cohort` holds these strengths for many learners at once as a row per item
+(an `array` with a strength per learner), so a reading step is a few
+element-wise operations over the rows of the items read and queries such as
+how many learners could read a target are answered across the cohort at
+once. The rows are kept multiplied by a per-learner scale which grows each
+step, so decay costs nothing for the items not read.
+
+`reinforcement` and `decay` can differ per learner, e.g. to simulate a class
+through a reading sequence:
+
+    gains = [random.uniform(0.2, 0.4) for i in range(30)]
+    cohort = Cohort(30, reinforcement=gains)
+    for target, readers in simulate(cohort, target_items, order, threshold=0.5):
+        ...
+
+`KnowledgeModel` is the same for a single learner.
+"""
+
+from array import array
+from collections import Counter
+import itertools
+from operator import add, ge, mul, sub, truediv
+
+from .bitset import Vocabulary
+
+# the type of the strengths (single precision keeps the rows small)
+STRENGTH_TYPE = "f"
+
+
+def per_learner(value, learners):
+    """
+    `value` as a list with an entry for each learner (it can either be a
+    single number for all of them or a sequence with one each)
+    """
+    if isinstance(value, (int, float)):
+        return [float(value)] * learners
+    value = [float(v) for v in value]
+    if len(value) != learners:
+        raise ValueError(f"expected a value for each of {learners} learners")
+    return value
+
+
+class Cohort:
+    """
+    The graded knowledge of `learners` learners of the items in `vocabulary`
+    (a new `Vocabulary` by default, which grows as items are read).
+
+    `reinforcement` is how much of the way to full strength each occurrence
+    of an item read takes it and `decay` the proportion of strength lost each
+    step. Each can be one number or one per learner. Token dicts read are
+    keyed on `key`.
+    """
+
+    def __init__(
+        self, learners, vocabulary=None, reinforcement=0.3, decay=0.01, key="lemma"
+    ):
+        self.learners = learners
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        self.key = key
+
+        self.reinforcement = array("d", per_learner(reinforcement, learners))
+        self.decay = array("d", per_learner(decay, learners))
+
+        self.ones = array("d", [1.0]) * learners
+        self.not_reinforced = array("d", map(sub, self.ones, self.reinforcement))
+        # how much the scale grows each step
+        self.growth = array("d", (1 / (1 - decay) for decay in self.decay))
+
+        # item id -> the strength of the item for each learner (None if it
+        # has never been read) multiplied by the learner's `scale`. Growing
+        # the scale decays every item at once, as the strengths are
+        # `row[learner] / scale[learner]`
+        self.rows = []
+        self.scale = array("d", self.ones)
+        self.step = 0
+
+        # the per-learner factors for a number of occurrences read (kept
+        # between steps) and the rest for the current step
+        self._keep_factors = {}
+        self._step_factors = {}
+
+    def _factors(self, key, make):
+        cache = self._keep_factors if key[0] == "keep" else self._step_factors
+        factors = cache.get(key)
+        if factors is None:
+            factors = cache[key] = array("d", make())
+        return factors
+
+    def _keep(self, count):
+        """
+        the proportion of the way to full strength not covered by `count`
+        reinforcements, for each learner
+        """
+        return self._factors(
+            ("keep", count), lambda: (k ** count for k in self.not_reinforced)
+        )
+
+    def _thresholds(self, threshold):
+        """
+        `threshold` in terms of the rows, for each learner
+        """
+        return self._factors(
+            ("threshold", threshold),
+            lambda: map(mul, self.scale, itertools.repeat(threshold)),
+        )
+
+    def _advance(self):
+        """
+        decay everything by a step
+        """
+        self.step += 1
+        self.scale = array("d", map(mul, self.scale, self.growth))
+        self._step_factors.clear()
+
+        # bring the scale back to 1 before it loses precision
+        if max(self.scale) > 1e12:
+            for item_id, row in enumerate(self.rows):
+                if row is not None:
+                    self.rows[item_id] = array(
+                        STRENGTH_TYPE, map(truediv, row, self.scale)
+                    )
+            self.scale = array("d", self.ones)
+
+    def _items(self, token_dicts):
+        # columnar token records (like those from `gnt_data.get_token_dicts`)
+        if hasattr(token_dicts, "column"):
+            return token_dicts.column(self.key)
+        return (t[self.key] for t in token_dicts)
+
+    def _row(self, item):
+        item_id = self.vocabulary.index.get(item)
+        if item_id is None or item_id >= len(self.rows):
+            return None
+        return self.rows[item_id]
+
+    def _zeros(self):
+        return array(STRENGTH_TYPE, [0.0]) * self.learners
+
+    def read(self, token_dicts, present=None):
+        """
+        Read the given token dicts (or columnar token records) as one step,
+        decaying every item and reinforcing those read. If `present` is given
+        (a true or false value for each learner), only the learners it is
+        true for read them.
+        """
+        self.read_items(self._items(token_dicts), present)
+
+    def read_items(self, items, present=None):
+        """
+        Read the given items (with repetitions) as one step, as for `read`.
+        """
+        self._advance()
+
+        ROWS = self.rows
+        SCALE = self.scale
+        ONES = self.ones
+        if present is not None:
+            # 1 for the learners reading and 0 for the others
+            PRESENT = array("d", (1.0 if p else 0.0 for p in present))
+            ABSENT = array("d", map(sub, ONES, PRESENT))
+
+        for item, count in Counter(items).items():
+            item_id = self.vocabulary.id(item)
+            if item_id >= len(ROWS):
+                ROWS.extend([None] * (item_id + 1 - len(ROWS)))
+
+            # 1 - (1 - s) * k == (1 - k) + s * k for the proportion k of the
+            # way to full strength not covered by the reinforcements (with
+            # the 1 - k multiplied by the scale like the rows)
+            keep = self._keep(count)
+            if present is None:
+                gain = self._factors(
+                    ("gain", count),
+                    lambda: map(mul, map(sub, ONES, keep), SCALE),
+                )
+            else:
+                gain = map(mul, map(mul, map(sub, ONES, keep), PRESENT), SCALE)
+                keep = map(add, map(mul, keep, PRESENT), ABSENT)
+
+            row = ROWS[item_id]
+            if row is not None:
+                gain = map(add, gain, map(mul, row, keep))
+            ROWS[item_id] = array(STRENGTH_TYPE, gain)
+
+    def learn_vocab(self, items, learners=None):
+        """
+        set the strength of the given items to full for all learners (or the
+        learners with the given indexes)
+        """
+        for item in items:
+            item_id = self.vocabulary.id(item)
+            if item_id >= len(self.rows):
+                self.rows.extend([None] * (item_id + 1 - len(self.rows)))
+            if learners is None:
+                row = array(STRENGTH_TYPE, self.scale)
+            else:
+                row = self.rows[item_id]
+                if row is None:
+                    row = self._zeros()
+                for learner in learners:
+                    row[learner] = self.scale[learner]
+            self.rows[item_id] = row
+
+    def strengths(self, item):
+        """
+        an array of the strength of the given item for each learner
+        """
+        row = self._row(item)
+        if row is None:
+            return self._zeros()
+        return array(STRENGTH_TYPE, map(truediv, row, self.scale))
+
+    def knowing(self, item, threshold=0.5):
+        """
+        the number of learners who know the given item at `threshold`
+        """
+        row = self._row(item)
+        if row is None:
+            return 0
+        return sum(map(ge, row, self._thresholds(threshold)))
+
+    def readers(self, items, threshold=0.5):
+        """
+        an array with, for each learner, 1 if they know all the given items at
+        `threshold` (so could read a target made of them) or 0 if not
+        """
+        THRESHOLDS = self._thresholds(threshold)
+        can_read = array("b", [1]) * self.learners
+        for item in set(items):
+            row = self._row(item)
+            if row is None:
+                return array("b", [0]) * self.learners
+            can_read = array("b", map(mul, can_read, map(ge, row, THRESHOLDS)))
+            # no need to look at the other items once nobody knows this one
+            if not any(can_read):
+                break
+        return can_read
+
+    def known_counts(self, threshold=0.5):
+        """
+        an array of the number of items each learner knows at `threshold`
+        """
+        THRESHOLDS = self._thresholds(threshold)
+        counts = array("i", [0]) * self.learners
+        for row in self.rows:
+            if row is not None:
+                counts = array("i", map(add, counts, map(ge, row, THRESHOLDS)))
+        return counts
+
+    def known(self, learner, threshold=0.5):
+        """
+        the set of items the learner with the given index knows at `threshold`
+        """
+        ITEMS = self.vocabulary.items
+        limit = threshold * self.scale[learner]
+        return {
+            ITEMS[item_id]
+            for item_id, row in enumerate(self.rows)
+            if row is not None and row[learner] >= limit
+        }
+
+
+class KnowledgeModel(Cohort):
+    """
+    The graded knowledge of a single learner (see `Cohort` for the
+    arguments), with the same queries as `LearningModel`.
+    """
+
+    def __init__(
+        self, vocabulary=None, reinforcement=0.3, decay=0.01, key="lemma", threshold=0.5
+    ):
+        super().__init__(1, vocabulary, reinforcement, decay, key)
+        self.threshold = threshold
+
+    def strength(self, item):
+        return self.strengths(item)[0]
+
+    def is_known(self, item):
+        return self.strength(item) >= self.threshold
+
+    def knows_all(self, items):
+        return self.readers(items, self.threshold)[0] == 1
+
+    def known_vocab(self):
+        return frozenset(self.known(0, self.threshold))
+
+    def vocab_size(self):
+        return self.known_counts(self.threshold)[0]
+
+
+def simulate(cohort, target_items, order, threshold=0.5, present=None):
+    """
+    Take the cohort through reading the targets of `target_items` in the
+    given `order` (such as the targets yielded by one of the strategies),
+    generating each target along with an array of which learners could read
+    it (see `Cohort.readers`) just before they did.
+
+    If given, `present(step)` returns which learners read the target at each
+    step (see `Cohort.read`).
+    """
+    for step, target in enumerate(order):
+        items = target_items[target]
+        yield target, cohort.readers(items, threshold)
+        cohort.read_items(items, None if present is None else present(step))
@@ -1,22 +1,258 @@
+from array import array
 from collections import Counter
 
+from .bitset import ItemSet
 
-class LearningModel:
+
+class ReadOnlyCounter(Counter):
+    """
+    A Counter that only its owner adds to (via `_add`), for handing out a
+    running count that stays up to date. The methods and operators that don't
+    modify it (including `+`, `-`, `&` and `|`, which return new Counters)
+    work as on any Counter but modifying it raises TypeError. Use `copy()`
+    for a Counter that can be modified, or to keep the counts as they are now.
+
+    As with a tuple, `+=`, `-=`, `&=` and `|=` leave it alone and give a new
+    Counter instead.
+    """
 
     def __init__(self):
+        pass
+
+    def _add(self, counts):
+        """
+        add the given counts (a mapping of keys to counts)
+        """
+        get = self.get
+        for key, count in counts.items():
+            dict.__setitem__(self, key, get(key, 0) + count)
+
+    def copy(self):
+        return Counter(self)
+
+    def __reduce__(self):
+        # copies and pickles are plain Counters
+        return Counter, (dict(self),)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("a ReadOnlyCounter can't be modified (copy() it first)")
+
+    __setitem__ = __delitem__ = _read_only
+    update = subtract = clear = pop = popitem = setdefault = _read_only
+
+    def __iadd__(self, other):
+        return self + other
+
+    def __isub__(self, other):
+        return self - other
+
+    def __iand__(self, other):
+        return self & other
+
+    def __ior__(self, other):
+        return self | other
+
+
+class ReadabilityIndex:
+    """
+    An index of how much of each target (such as each verse) is readable with
+    the items known, built from a dictionary mapping targets to their items
+    (like those from `gnt_data.get_tokens_by_chunk`).
+
+    It keeps the targets each item occurs in and a running count of known
+    tokens per target, with the targets bucketed by percentage known. So
+    learning items only touches the targets they occur in and `readable`
+    only looks at the targets that are (nearly) readable enough.
+
+    Usually got via `LearningModel.readability_index`, which keeps it up to
+    date as vocabulary is learnt.
+    """
+
+    BUCKETS = 100
+
+    def __init__(self, items_by_target, known=()):
+        self.targets = list(items_by_target)
+        self.target_index = {target: i for i, target in enumerate(self.targets)}
+
+        # the number of tokens in each target and how many are known
+        self.lengths = array("i", map(len, items_by_target.values()))
+        self.known_counts = array("i", bytes(4 * len(self.targets)))
+
+        # item -> the ids of the targets it occurs in (once per occurrence)
+        self.postings = {}
+        for target_id, items in enumerate(items_by_target.values()):
+            for item in items:
+                self.postings.setdefault(item, array("i")).append(target_id)
+
+        # the ids of the targets with each whole percentage of tokens known
+        self.buckets = [set() for i in range(self.BUCKETS + 1)]
+        for target_id in range(len(self.targets)):
+            self.buckets[self._bucket(target_id)].add(target_id)
+
+        self.known = set()
+        self.learn(known)
+
+    def _bucket(self, target_id):
+        length = self.lengths[target_id]
+        if length == 0:
+            return self.BUCKETS
+        return self.known_counts[target_id] * self.BUCKETS // length
+
+    def learn(self, items):
+        """
+        mark the given items as known, updating the targets they occur in
+        """
+        for item in items:
+            if item in self.known:
+                continue
+            self.known.add(item)
+            for target_id in self.postings.get(item, ()):
+                before = self._bucket(target_id)
+                self.known_counts[target_id] += 1
+                after = self._bucket(target_id)
+                if after != before:
+                    self.buckets[before].remove(target_id)
+                    self.buckets[after].add(target_id)
+
+    def proportion_known(self, target):
+        """
+        the proportion of the tokens in the given target that are known
+        """
+        target_id = self.target_index.get(target)
+        if target_id is None:
+            raise ValueError(f"{target!r} is not a target")
+        length = self.lengths[target_id]
+        return self.known_counts[target_id] / length if length else 1.0
+
+    def readable(self, proportion=1.0):
+        """
+        a list of the targets (in their original order) with at least the
+        given proportion of their tokens known
+        """
+        # only the bucket below the one the proportion falls in can hold
+        # targets either side of it (allowing for float rounding)
+        lowest = max(int(proportion * self.BUCKETS) - 1, 0)
+        target_ids = [
+            target_id
+            for bucket in self.buckets[lowest:]
+            for target_id in bucket
+            if self.known_counts[target_id] >= proportion * self.lengths[target_id]
+        ]
+        return [self.targets[target_id] for target_id in sorted(target_ids)]
+
+
+class LearningModel:
+
+    def __init__(self, keep_tokens=True, vocabulary=None):
+        """
+        If `keep_tokens` is False, only the counts of each field of the
+        tokens read are kept (not the tokens themselves) so the model stays
+        small however much is read.
+
+        If a `sequencing_tools.bitset.Vocabulary` is given, the known
+        vocabulary is kept as an `ItemSet` over it, so learning and checking
+        whole sets of lemmas (`learn_vocab`, `knows_all`) work a word at a
+        time rather than a lemma at a time.
+        """
+        self._keep_tokens = keep_tokens
+
+        # a list of the batches of token dicts read
         self._seen = []
 
+        # a running `ReadOnlyCounter` for each token field. When tokens are
+        # kept these are only started for fields asked for via `seen`,
+        # otherwise every field is counted as tokens are read.
+        self._counters = {}
+
         # initially just a set without any model of how well know the item is
-        self._known_vocab = set()
+        if vocabulary is None:
+            self._known_vocab = set()
+        else:
+            self._known_vocab = ItemSet(vocabulary)
+
+        # readability indexes to keep up to date as vocabulary is learnt
+        self._indexes = []
 
     def read(self, token_dicts):
-        self._seen.extend(token_dicts)
+        # columnar token records (like those from `gnt_data.get_token_dicts`)
+        # are immutable views so are kept as they are rather than copied
+        if hasattr(token_dicts, "column"):
+            batch = token_dicts
+        else:
+            batch = list(token_dicts)
+
+        if self._keep_tokens:
+            self._seen.append(batch)
+            for key, counter in self._counters.items():
+                counter._add(self._count(batch, key))
+        elif hasattr(batch, "column"):
+            for key in batch[0] if batch else ():
+                self._counter(key)._add(self._count(batch, key))
+        else:
+            counts = {}
+            for t in batch:
+                for key, value in t.items():
+                    counts.setdefault(key, Counter())[value] += 1
+            for key, counter in counts.items():
+                self._counter(key)._add(counter)
+
+    def _counter(self, key):
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = ReadOnlyCounter()
+        return counter
+
+    @staticmethod
+    def _count(token_dicts, key):
+        if hasattr(token_dicts, "column"):
+            return Counter(token_dicts.column(key))
+        return Counter(t[key] for t in token_dicts)
 
     def seen(self, key):
-        return Counter([t[key] for t in self._seen])
+        """
+        a `ReadOnlyCounter` of how many times each value of the given token
+        field has been seen, kept up to date as more is read.
+
+        It's the model's own running count rather than a fresh Counter, so
+        reading more changes a counter already returned: take a `copy()` to
+        compare counts before and after reading, e.g.
+
+            before = lm.seen("lemma").copy()
+            lm.read(token_dicts)
+            new = lm.seen("lemma") - before
+        """
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = ReadOnlyCounter()
+            for token_dicts in self._seen:
+                counter._add(self._count(token_dicts, key))
+            if self._keep_tokens:
+                self._counters[key] = counter
+        return counter
 
     def learn_vocab(self, lemmas):
-        self._known_vocab |= set(lemmas)
+        if isinstance(self._known_vocab, ItemSet):
+            new_lemmas = self._known_vocab.missing(lemmas)
+        else:
+            new_lemmas = set(lemmas) - self._known_vocab
+        self._known_vocab |= new_lemmas
+        for index in self._indexes:
+            index.learn(new_lemmas)
+
+    def readability_index(self, items_by_target):
+        """
+        a `ReadabilityIndex` over the given targets for the vocabulary known,
+        which is kept up to date by `learn_vocab`
+        """
+        index = ReadabilityIndex(items_by_target, self._known_vocab)
+        self._indexes.append(index)
+        return index
+
+    def known_vocab(self):
+        """
+        a frozenset of the lemmas known
+        """
+        return frozenset(self._known_vocab)
 
     def vocab_size(self):
         return len(self._known_vocab)
@@ -24,6 +260,16 @@ class LearningModel:
     def is_known(self, lemma):
         return lemma in self._known_vocab
 
+    def knows_all(self, lemmas):
+        """
+        whether all the given lemmas are known (e.g. whether a target can be
+        read). With a vocabulary, passing the lemmas as an `ItemSet` over it
+        (built once per target, say) makes this a single word-level check.
+        """
+        if isinstance(self._known_vocab, ItemSet):
+            return self._known_vocab.covers(lemmas)
+        return self._known_vocab.issuperset(lemmas)
+
     def known_subset(self, counter):
         """
         subset the given counter to the known keys
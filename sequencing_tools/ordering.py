@@ -1,4 +1,11 @@
 import collections
+import heapq
+import itertools
+import math
+import time
+
+from .bitset import bits, mask, popcount
+from .problem import compile_problem
 
 
 def frequency(
@@ -6,13 +13,15 @@ def frequency(
     items_already_known=set(),
     yield_already_known=False,
     targets_to_ignore=set(),
+    trace=None,
 ):
     """
     Orders the learning of items based purely on frequency. Targets ordered by
     when they are achieved.
 
     The input `target_items` is a dictionary mapping targets to the
-    prerequisite items.
+    prerequisite items (or a `sequencing_tools.problem.Problem` compiled from
+    one, which saves compiling it again on each call).
 
     If included, `items_already_known` is a set of items that can be assumed
     to have already been learnt (although no assumption is made about targets
@@ -32,48 +41,62 @@ def frequency(
     are excluded by default, but will be yielded at the start if
     `yield_already_known` is passed in as True. The order in which they are
     yielded is just the `target_items` order.
-    """
-
-    # a dictionary mapping targets to a set of items still not learnt
-    MISSING_IN_TARGET = {}
 
-    # a dictionary mapping items to a set of targets the items are needed for
-    # and are missing from
-    TARGETS_MISSING = collections.defaultdict(set)
-
-    c = collections.Counter()
+    If included, `trace` is a `sequencing_tools.trace.Trace` in which to
+    record the time taken and work done in each step.
+    """
 
-    for target, items in target_items.items():
+    if trace is not None:
+        trace.begin()
 
-        if target in targets_to_ignore:
-            continue
+    problem = compile_problem(target_items)
+    TARGETS = problem.targets
+    ITEMS = problem.items
 
-        items_to_learn = [item for item in items if item not in items_already_known]
-        c.update(items_to_learn)
+    # the ids of items already known and targets to ignore
+    KNOWN = problem.item_ids(items_already_known)
+    IGNORED = problem.target_ids(targets_to_ignore)
 
-        MISSING_IN_TARGET[target] = set(items_to_learn)
-        for item in items_to_learn:
-            TARGETS_MISSING[item].add(target)
+    # a dictionary mapping target ids to the number of items still not
+    # learnt (as each item is only gone through once, counting is enough).
+    # The targets each item is needed for are in `problem.targets_of` so only
+    # a target being missing from here (because it is ignored) needs checking.
+    MISSING_IN_TARGET = problem.missing_counts(KNOWN, IGNORED)
 
     ITEMS_TO_LEARN = set()
 
+    if trace is not None:
+        trace.ready()
+
     if yield_already_known:
-        for target, items in MISSING_IN_TARGET.items():
-            if len(items) == 0:
-                yield target, items
+        for target, missing in MISSING_IN_TARGET.items():
+            if missing == 0:
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], set()
+                if trace is not None:
+                    trace.resume()
 
-    for next_item, count in c.most_common():
+    # items not known, most frequent first
+    for next_item in problem.frequency_order(KNOWN, IGNORED):
 
-        ITEMS_TO_LEARN.add(next_item)
+        ITEMS_TO_LEARN.add(ITEMS[next_item])
 
         # for each target missing that item, remove the item
-        for target in TARGETS_MISSING[next_item]:
-            MISSING_IN_TARGET[target].remove(next_item)
+        for target in problem.targets_of(next_item):
+            missing = MISSING_IN_TARGET.get(target)
+            if missing is None:
+                continue
+            MISSING_IN_TARGET[target] = missing - 1
 
             # if the target is now missing no items...
-            if len(MISSING_IN_TARGET[target]) == 0:
+            if missing == 1:
 
-                yield target, ITEMS_TO_LEARN
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], ITEMS_TO_LEARN
+                if trace is not None:
+                    trace.resume()
 
                 # remove from missing in that target
                 del MISSING_IN_TARGET[target]
@@ -81,8 +104,13 @@ def frequency(
                 # reset items to learn
                 ITEMS_TO_LEARN = set()
 
-        # remove the item from all targets requiring it
-        del TARGETS_MISSING[next_item]
+        if trace is not None:
+            touched = sum(
+                1 for target in problem.targets_of(next_item) if target not in IGNORED
+            )
+            trace.step(
+                ITEMS[next_item], touched, 0, touched + 1, len(MISSING_IN_TARGET)
+            )
 
 
 def frequency_optimised(
@@ -90,6 +118,7 @@ def frequency_optimised(
     items_already_known=set(),
     yield_already_known=False,
     targets_to_ignore=set(),
+    trace=None,
 ):
     """
     Orders the learning of targets by firstly ordering items by frequency but
@@ -97,7 +126,8 @@ def frequency_optimised(
     achievable by the frequency ordering.
 
     The input `target_items` is a dictionary mapping targets to the
-    prerequisite items.
+    prerequisite items (or a `sequencing_tools.problem.Problem` compiled from
+    one, which saves compiling it again on each call).
 
     If included, `items_already_known` is a set of items that can be assumed
     to have already been learnt (although no assumption is made about targets
@@ -116,64 +146,86 @@ def frequency_optimised(
     are excluded by default, but will be yielded at the start if
     `yield_already_known` is passed in as True. The order in which they are
     yielded is just the `target_items` order.
-    """
-
-    # track the set of all items already learnt
-    ALREADY_LEARNT = set(items_already_known)
-
-    # a dictionary mapping targets to the set of prerequisite items
-    IN_TARGET = {}
 
-    # a dictionary mapping targets to a set of items still not learnt
-    MISSING_IN_TARGET = {}
-
-    # a dictionary mapping items to a set of targets the items are needed for
-    # and are missing from
-    TARGETS_MISSING = collections.defaultdict(set)
+    If included, `trace` is a `sequencing_tools.trace.Trace` in which to
+    record the time taken and work done in each step.
+    """
 
-    c = collections.Counter()
+    if trace is not None:
+        trace.begin()
 
-    for target, items in target_items.items():
+    problem = compile_problem(target_items)
+    TARGETS = problem.targets
+    ITEMS = problem.items
 
-        if target in targets_to_ignore:
-            continue
+    # the ids of items already known and targets to ignore
+    KNOWN = problem.item_ids(items_already_known)
+    IGNORED = problem.target_ids(targets_to_ignore)
 
-        IN_TARGET[target] = set(items)
+    # track all the item ids already learnt as the bits of an int, so what is
+    # new to learn for a target is a couple of operations on whole words
+    TARGET_MASKS = problem.target_masks()
+    ALREADY_LEARNT = mask(KNOWN)
 
-        items_to_learn = [item for item in items if item not in items_already_known]
-        c.update(items_to_learn)
+    # a dictionary mapping target ids to the number of items still not
+    # learnt (as each item is only gone through once, counting is enough)
+    MISSING_IN_TARGET = problem.missing_counts(KNOWN, IGNORED)
 
-        MISSING_IN_TARGET[target] = set(items_to_learn)
-        for item in items_to_learn:
-            TARGETS_MISSING[item].add(target)
+    if trace is not None:
+        trace.ready()
 
     if yield_already_known:
-        for target, items in MISSING_IN_TARGET.items():
-            if len(items) == 0:
-                yield target, items
+        for target, missing in MISSING_IN_TARGET.items():
+            if missing == 0:
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], set()
+                if trace is not None:
+                    trace.resume()
+
+    # items not known, most frequent first
+    for next_item in problem.frequency_order(KNOWN, IGNORED):
 
-    for next_item, count in c.most_common():
+        if trace is not None:
+            learnt_now = 0
 
         # for each target missing that item, remove the item
-        for target in TARGETS_MISSING[next_item]:
-            MISSING_IN_TARGET[target].remove(next_item)
+        for target in problem.targets_of(next_item):
+            missing = MISSING_IN_TARGET.get(target)
+            if missing is None:
+                continue
+            MISSING_IN_TARGET[target] = missing - 1
 
             # if the target is now missing no items...
-            if len(MISSING_IN_TARGET[target]) == 0:
+            if missing == 1:
 
                 # calculate what is new to learn for that target
-                items_to_learn = IN_TARGET[target] - ALREADY_LEARNT
+                items_to_learn = TARGET_MASKS[target] & ~ALREADY_LEARNT
 
-                yield target, items_to_learn
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], {ITEMS[item] for item in bits(items_to_learn)}
+                if trace is not None:
+                    trace.resume()
+                    learnt_now += popcount(items_to_learn)
 
                 # remove from missing in that target
                 del MISSING_IN_TARGET[target]
 
                 # add to items already learnt
-                ALREADY_LEARNT.update(items_to_learn)
+                ALREADY_LEARNT |= items_to_learn
 
-        # remove the item from all targets requiring it
-        del TARGETS_MISSING[next_item]
+        if trace is not None:
+            touched = sum(
+                1 for target in problem.targets_of(next_item) if target not in IGNORED
+            )
+            trace.step(
+                ITEMS[next_item],
+                touched,
+                0,
+                touched + learnt_now,
+                len(MISSING_IN_TARGET),
+            )
 
 
 def next_best(
@@ -181,11 +233,12 @@ def next_best(
     items_already_known=set(),
     yield_already_known=False,
     targets_to_ignore=set(),
+    trace=None,
 ):
     """
     Orders the learning of targets based on, at each step, assigning a score to
     each unknown item and prioritising the highest scoring item next before
-    recalculating the scores all over again with the remaining items.
+    updating the scores of the remaining items.
 
     The score is currently the sum of
 
@@ -196,12 +249,18 @@ def next_best(
     Therefore, at each step, it favours a next item that is the only missing
     item (or one of only a few missing items) from lots of targets.
 
+    Scores are kept up to date incrementally (only the items sharing a target
+    with the item just learnt change) and the highest is taken from a heap, so
+    each step costs in proportion to what changed rather than to the size of
+    `target_items`. Ties are broken exactly as a full recalculation would.
+
     Once all the prerequisite items in a target have come up as the next item,
     that target is yielded along with a set of the items for that target that
     have not yet been seen.
 
     The input `target_items` is a dictionary mapping targets to the
-    prerequisite items.
+    prerequisite items (or a `sequencing_tools.problem.Problem` compiled from
+    one, which saves compiling it again on each call).
 
     If included, `items_already_known` is a set of items that can be assumed
     to have already been learnt (although no assumption is made about targets
@@ -217,78 +276,451 @@ def next_best(
     are excluded by default, but will be yielded at the start if
     `yield_already_known` is passed in as True. The order in which they are
     yielded is just the `target_items` order.
+
+    If included, `trace` is a `sequencing_tools.trace.Trace` in which to
+    record the time taken and work done in each step.
+    """
+
+    if trace is not None:
+        trace.begin()
+
+    problem = compile_problem(target_items)
+    TARGETS = problem.targets
+    ITEMS = problem.items
+    RANK = problem.target_rank().__getitem__
+
+    # the ids of items already known and targets to ignore
+    KNOWN = problem.item_ids(items_already_known)
+    IGNORED = problem.target_ids(targets_to_ignore)
+
+    # track all the item ids already learnt as the bits of an int
+    TARGET_MASKS = problem.target_masks()
+    ALREADY_LEARNT = mask(KNOWN)
+
+    # a dictionary mapping target ids to a set of item ids still not learnt
+    MISSING_IN_TARGET = problem.missing_sets(KNOWN, IGNORED)
+
+    # a dictionary mapping item ids to a list of target ids (in order) the
+    # items are needed for and are missing from
+    TARGETS_MISSING = problem.targets_missing(KNOWN, IGNORED)
+
+    if yield_already_known:
+        for target, items in MISSING_IN_TARGET.items():
+            if len(items) == 0:
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], set()
+                if trace is not None:
+                    trace.resume()
+
+    # the score of an item is kept as an exact integer: a target missing L
+    # items contributes 2 ** (K - L) where K is the largest number of missing
+    # items in any target. When a target loses an item, every other item it
+    # is missing just gains 2 ** (K - L_before), so only the targets of the
+    # item just learnt (and their other missing items) need rescoring.
+    K = max((len(missing) for missing in MISSING_IN_TARGET.values()), default=0)
+
+    # the order in which items were first encountered when walking the
+    # targets (and the items of each in order). Ties are broken in
+    # favour of the item encountered last and, because an item's targets
+    # never change until it is learnt, that order is fixed for the whole run.
+    FIRST_SEEN = problem.first_seen(KNOWN, IGNORED)
+
+    SCORE = dict.fromkeys(FIRST_SEEN, 0)
+
+    for missing in MISSING_IN_TARGET.values():
+        weight = 1 << (K - len(missing))
+        for item in missing:
+            SCORE[item] += weight
+
+    # scores were summed as floats and a float sum is only exact while every
+    # term is within 53 bits of the total. Targets missing more than
+    # `LONG_TARGET` items are "long" and an item missing from any long target
+    # may have a float score that differs from its exact one, so those items
+    # live on a separate heap and are checked against the float sum near ties.
+    LONG_TARGET = 52 - len(MISSING_IN_TARGET).bit_length()
+    LONG_COUNT = collections.Counter()
+    for missing in MISSING_IN_TARGET.values():
+        if len(missing) > LONG_TARGET:
+            LONG_COUNT.update(missing)
+
+    def float_score(item):
+        # recalculate the score exactly as it would have been summed
+        score = 0
+        for target in TARGETS_MISSING[item]:
+            score += math.ldexp(1.0, -len(MISSING_IN_TARGET[target]))
+        return score
+
+    HEAP = ScoreHeap(SCORE, FIRST_SEEN, LONG_COUNT, K, float_score)
+    HEAP.rebuild()
+
+    if trace is not None:
+        trace.ready()
+
+    # stop when there are no missing items
+    while SCORE:
+
+        # the next item to learn is the one with the highest score
+        next_item = HEAP.pop_best()
+        del SCORE[next_item]
+
+        if trace is not None:
+            touched = len(TARGETS_MISSING[next_item])
+            learnt_now = 0
+
+        RESCORED = set()
+
+        # for each target missing that item, remove the item
+        for target in sorted(TARGETS_MISSING[next_item], key=RANK):
+            missing = MISSING_IN_TARGET[target]
+            delta = 1 << (K - len(missing))
+            no_longer_long = len(missing) == LONG_TARGET + 1
+            missing.remove(next_item)
+
+            for item in missing:
+                SCORE[item] += delta
+                if no_longer_long:
+                    LONG_COUNT[item] -= 1
+            RESCORED.update(missing)
+
+            # if the target is now missing no items...
+            if len(missing) == 0:
+
+                # calculate what is new to learn for that target
+                items_to_learn = TARGET_MASKS[target] & ~ALREADY_LEARNT
+
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], {ITEMS[item] for item in bits(items_to_learn)}
+                if trace is not None:
+                    trace.resume()
+                    learnt_now += popcount(items_to_learn)
+
+                # remove from missing in that target
+                del MISSING_IN_TARGET[target]
+
+                # add to items already learnt
+                ALREADY_LEARNT |= items_to_learn
+
+        # remove the item from all targets requiring it
+        del TARGETS_MISSING[next_item]
+
+        for item in RESCORED:
+            HEAP.push(item)
+
+        if trace is not None:
+            trace.step(
+                ITEMS[next_item],
+                touched,
+                len(RESCORED),
+                touched + len(RESCORED) + learnt_now,
+                len(MISSING_IN_TARGET),
+            )
+
+
+def next_best_approximate(
+    target_items,
+    items_already_known=set(),
+    yield_already_known=False,
+    targets_to_ignore=set(),
+    cutoff=10,
+    trace=None,
+):
     """
+    An approximation of `next_best` for very large `target_items`.
 
-    # track the set of all items already learnt
-    ALREADY_LEARNT = set(items_already_known)
+    Only targets missing at most `cutoff` items are scored as in `next_best`
+    (the score of an item is the sum of `1 / 2 ** number_of_items_missing`
+    over those targets), as they carry most of the score. Targets missing
+    more are only counted, and ties in score (including when no item has a
+    score at all) go to the item missing from the most of them, so the long
+    tail falls back to ordering by frequency.
 
-    # a dictionary mapping targets to the set of prerequisite items
-    IN_TARGET = {}
+    This means removing an item from a target missing more than `cutoff + 1`
+    items doesn't touch the other items in it, which is where `next_best`
+    spends most of its time on large corpora. Use `next_best_drift` to see
+    how far the order differs from `next_best` for a given `cutoff`.
 
-    # a dictionary mapping targets to a set of items still not learnt
-    MISSING_IN_TARGET = {}
+    The other arguments and what is yielded are as for `next_best`.
 
-    # a dictionary mapping items to a set of targets the items are needed for
-    # and are missing from
-    TARGETS_MISSING = collections.defaultdict(set)
+    If included, `trace` is a `sequencing_tools.trace.Trace` in which to
+    record the time taken and work done in each step.
+    """
 
-    # fill the dictionaries with initial data based on the input
+    if trace is not None:
+        trace.begin()
 
-    for target, items in target_items.items():
+    problem = compile_problem(target_items)
+    TARGETS = problem.targets
+    ITEMS = problem.items
+    RANK = problem.target_rank().__getitem__
 
-        if target in targets_to_ignore:
-            continue
+    # the ids of items already known and targets to ignore
+    KNOWN = problem.item_ids(items_already_known)
+    IGNORED = problem.target_ids(targets_to_ignore)
 
-        IN_TARGET[target] = set(items)
+    # track all the item ids already learnt as the bits of an int
+    TARGET_MASKS = problem.target_masks()
+    ALREADY_LEARNT = mask(KNOWN)
 
-        items_to_learn = [item for item in items if item not in items_already_known]
+    # a dictionary mapping target ids to a set of item ids still not learnt
+    MISSING_IN_TARGET = problem.missing_sets(KNOWN, IGNORED)
 
-        MISSING_IN_TARGET[target] = set(items_to_learn)
-        for item in items_to_learn:
-            TARGETS_MISSING[item].add(target)
+    # a dictionary mapping item ids to a list of target ids (in order) the
+    # items are needed for and are missing from
+    TARGETS_MISSING = problem.targets_missing(KNOWN, IGNORED)
 
     if yield_already_known:
         for target, items in MISSING_IN_TARGET.items():
             if len(items) == 0:
-                yield target, items
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], set()
+                if trace is not None:
+                    trace.resume()
 
-    while True:
+    # the score and the count of long targets are combined into one exact
+    # integer: a target missing L <= `cutoff` items contributes
+    # 2 ** (cutoff - L) above the lowest SHIFT bits and a longer target
+    # contributes 1, which is too little to ever carry into the score
+    SHIFT = len(problem).bit_length()
 
-        # for each item, a score of how bad it is that it is missing
-        MISSING_ITEMS = collections.defaultdict(int)
+    def weight(missing_count):
+        if missing_count > cutoff:
+            return 1
+        return 1 << (cutoff - missing_count + SHIFT)
 
-        for missing in MISSING_IN_TARGET.values():
-            for item in missing:
-                # if item is only missing item for a target, add 1/2 to its score
-                # if item is 1 of 2 missing items for a target, add 1/4
-                # if item is 1 of 3 missing items for a target, add 1/8
-                # and so on...
-                MISSING_ITEMS[item] += 1.0 / (2 ** len(missing))
+    # the order in which items were first encountered, as in `next_best`
+    FIRST_SEEN = problem.first_seen(KNOWN, IGNORED)
+
+    SCORE = dict.fromkeys(FIRST_SEEN, 0)
+
+    for missing in MISSING_IN_TARGET.values():
+        missing_weight = weight(len(missing))
+        for item in missing:
+            SCORE[item] += missing_weight
+
+    # scores are small enough that none are summed inexactly
+    HEAP = ScoreHeap(SCORE, FIRST_SEEN, collections.Counter(), cutoff, None)
+    HEAP.rebuild()
+
+    if trace is not None:
+        trace.ready()
 
-        # stop if there are no missing items
-        if not MISSING_ITEMS:
-            break
+    # stop when there are no missing items
+    while SCORE:
 
-        # otherwise the next item to learn is the one with the highest score
-        next_item = sorted(MISSING_ITEMS, key=MISSING_ITEMS.get)[-1]
+        # the next item to learn is the one with the highest score
+        next_item = HEAP.pop_best()
+        del SCORE[next_item]
+
+        if trace is not None:
+            touched = len(TARGETS_MISSING[next_item])
+            learnt_now = 0
+
+        RESCORED = set()
 
         # for each target missing that item, remove the item
-        for target in sorted(TARGETS_MISSING[next_item]):
-            MISSING_IN_TARGET[target].remove(next_item)
+        for target in sorted(TARGETS_MISSING[next_item], key=RANK):
+            missing = MISSING_IN_TARGET[target]
+            missing_count = len(missing)
+            missing.remove(next_item)
+
+            # only targets that are (or are now) short enough to be scored
+            # change the scores of their other items
+            if missing_count <= cutoff + 1:
+                delta = weight(missing_count - 1) - weight(missing_count)
+                for item in missing:
+                    SCORE[item] += delta
+                RESCORED.update(missing)
 
             # if the target is now missing no items...
-            if len(MISSING_IN_TARGET[target]) == 0:
+            if len(missing) == 0:
 
                 # calculate what is new to learn for that target
-                items_to_learn = IN_TARGET[target] - ALREADY_LEARNT
+                items_to_learn = TARGET_MASKS[target] & ~ALREADY_LEARNT
 
-                yield target, items_to_learn
+                if trace is not None:
+                    trace.pause()
+                yield TARGETS[target], {ITEMS[item] for item in bits(items_to_learn)}
+                if trace is not None:
+                    trace.resume()
+                    learnt_now += popcount(items_to_learn)
 
                 # remove from missing in that target
                 del MISSING_IN_TARGET[target]
 
                 # add to items already learnt
-                ALREADY_LEARNT.update(items_to_learn)
+                ALREADY_LEARNT |= items_to_learn
 
         # remove the item from all targets requiring it
         del TARGETS_MISSING[next_item]
+
+        for item in RESCORED:
+            HEAP.push(item)
+
+        if trace is not None:
+            trace.step(
+                ITEMS[next_item],
+                touched,
+                len(RESCORED),
+                touched + len(RESCORED) + learnt_now,
+                len(MISSING_IN_TARGET),
+            )
+
+
+def next_best_drift(
+    target_items,
+    items_already_known=set(),
+    targets_to_ignore=set(),
+    cutoff=10,
+    limit=None,
+):
+    """
+    Compare the order of targets from `next_best_approximate` with the given
+    `cutoff` to that from `next_best` (over the first `limit` targets, if
+    given) and return a dictionary of:
+
+    - `steps`: the number of targets compared
+    - `first_difference`: the first step at which the targets differ (or None)
+    - `same_position`: the proportion of steps with the same target
+    - `mean_displacement`: the mean difference in position of the targets
+      yielded by both
+    - `exact_seconds` and `approximate_seconds`: the time each took
+    """
+    problem = compile_problem(target_items)
+    orders = []
+    seconds = []
+    for strategy, kwargs in [
+        (next_best, {}),
+        (next_best_approximate, {"cutoff": cutoff}),
+    ]:
+        start = time.perf_counter()
+        steps = strategy(
+            problem, items_already_known, False, targets_to_ignore, **kwargs
+        )
+        orders.append([target for target, items in itertools.islice(steps, limit)])
+        seconds.append(time.perf_counter() - start)
+
+    exact, approximate = orders
+    steps = min(len(exact), len(approximate))
+    same = [exact[i] == approximate[i] for i in range(steps)]
+    approximate_position = {target: i for i, target in enumerate(approximate)}
+    displacements = [
+        abs(i - approximate_position[target])
+        for i, target in enumerate(exact)
+        if target in approximate_position
+    ]
+
+    return {
+        "steps": steps,
+        "first_difference": same.index(False) if False in same else None,
+        "same_position": sum(same) / steps if steps else 1.0,
+        "mean_displacement": (
+            sum(displacements) / len(displacements) if displacements else 0.0
+        ),
+        "exact_seconds": seconds[0],
+        "approximate_seconds": seconds[1],
+    }
+
+
+class ScoreHeap:
+    """
+    The items `next_best` chooses between, highest score first.
+
+    `score` maps each item to its exact integer score (in units of
+    `2 ** -scale`) and ties go to the item with the highest `order[item]`.
+
+    Scores used to be summed as floats and a float sum is only exact while
+    every term is within 53 bits of the total. An item with a non-zero
+    `long_count[item]` is missing from a target long enough that its float
+    score may differ from its exact one, so those items are kept on a
+    separate heap and, when near the top, compared by `float_score(item)`
+    instead. The item chosen is therefore always the one a float summation
+    would choose.
+
+    Entries are invalidated lazily: an item must be pushed again whenever its
+    score, order or long count changes, and is forgotten once it is removed
+    from `score`.
+    """
+
+    def __init__(self, score, order, long_count, scale, float_score):
+        self.score = score
+        self.order = order
+        self.long_count = long_count
+        self.scale = scale
+        self.float_score = float_score
+        self.safe = []
+        self.unsafe = []
+
+    def heap_for(self, item):
+        return self.unsafe if self.long_count[item] else self.safe
+
+    def push(self, item):
+        heapq.heappush(
+            self.heap_for(item), (-self.score[item], -self.order[item], item)
+        )
+
+    def rebuild(self):
+        """
+        rebuild the heaps from the current scores, dropping all stale entries
+        """
+        self.safe = []
+        self.unsafe = []
+        for item in self.score:
+            self.heap_for(item).append(
+                (-self.score[item], -self.order[item], item)
+            )
+        heapq.heapify(self.safe)
+        heapq.heapify(self.unsafe)
+
+    def peek(self, heap):
+        # discard entries made stale by a rescore, a move between heaps or
+        # the item being learnt
+        while heap:
+            neg_score, neg_order, item = heap[0]
+            if (
+                item in self.score
+                and -neg_score == self.score[item]
+                and -neg_order == self.order[item]
+                and self.heap_for(item) is heap
+            ):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def pop_best(self):
+        """
+        remove and return the best item (or None if there are no items)
+        """
+        safe = self.peek(self.safe)
+        unsafe = self.peek(self.unsafe)
+
+        if unsafe is None:
+            return heapq.heappop(self.safe)[2] if safe is not None else None
+
+        # any unsafe item whose float score could reach the best one
+        top = max(-entry[0] for entry in (safe, unsafe) if entry is not None)
+        threshold = top - (top >> 30)
+        candidates = []
+        while unsafe is not None and -unsafe[0] >= threshold:
+            candidates.append(heapq.heappop(self.unsafe))
+            unsafe = self.peek(self.unsafe)
+
+        if safe is None and len(candidates) == 1:
+            return candidates[0][2]
+
+        ranked = [
+            (self.float_score(entry[2]), -entry[1], entry[2]) for entry in candidates
+        ]
+        if safe is not None:
+            ranked.append((-safe[0] / (1 << self.scale), -safe[1], safe[2]))
+        best = max(ranked, key=lambda x: (x[0], x[1]))[2]
+
+        for entry in candidates:
+            if entry[2] != best:
+                heapq.heappush(self.unsafe, entry)
+        if safe is not None and safe[2] == best:
+            heapq.heappop(self.safe)
+
+        return best
@@ -0,0 +1,314 @@
+from array import array
+import collections
+from operator import sub
+
+from .bitset import Vocabulary, mask
+
+
+class Problem:
+    """
+    A compiled form of a `target_items` dictionary (mapping targets to their
+    prerequisite items) that can be passed to any of the strategies in
+    `sequencing_tools.ordering` in place of the dictionary itself.
+
+    Targets and items are interned to dense integer ids (in order of first
+    appearance) once, and the target→item and item→target adjacency is kept
+    in compressed sparse row (CSR) form: a flat array of ids plus an array of
+    offsets into it, so the items of target `t` are
+    `target_item_ids[target_offsets[t]:target_offsets[t + 1]]`.
+
+    Building the problem once and reusing it across runs avoids rebuilding
+    dictionaries of sets keyed by strings on every call.
+
+    e.g. `Problem(get_tokens_by_chunk(TokenType.lemma, ChunkType.verse))`
+
+    `target_items` may also be an iterable of `(target, items)` pairs (such as
+    `sequencing_tools.ingest.target_items`) so a corpus can be compiled as it
+    is read without building the dictionary at all.
+    """
+
+    def __init__(self, target_items):
+
+        # id -> target and target -> id
+        self.targets = []
+        self.target_index = {}
+
+        # id -> item and item -> id
+        self.items = []
+        self.item_index = {}
+
+        # the items of each target, in order and with repetitions, needed for
+        # frequency counts
+        self.token_offsets = array("q", [0])
+        self.target_tokens = array("i")
+
+        # the distinct items of each target, in order of first appearance
+        # (rather than in the iteration order of a set, which depends on the
+        # hash seed) so the strategies' tie-breaking is the same in every
+        # process
+        self.target_offsets = array("q", [0])
+        self.target_item_ids = array("i")
+
+        # item id -> the ids of the targets it appears in, in order
+        targets_for_item = []
+
+        if hasattr(target_items, "items"):
+            target_items = target_items.items()
+
+        for target, items in target_items:
+            target_id = len(self.targets)
+            self.targets.append(target)
+            self.target_index[target] = target_id
+
+            start = len(self.target_tokens)
+            for item in items:
+                item_id = self.item_index.get(item)
+                if item_id is None:
+                    item_id = len(self.items)
+                    self.items.append(item)
+                    self.item_index[item] = item_id
+                    targets_for_item.append(array("i"))
+                self.target_tokens.append(item_id)
+            self.token_offsets.append(len(self.target_tokens))
+
+            for item_id in dict.fromkeys(self.target_tokens[start:]):
+                self.target_item_ids.append(item_id)
+                targets_for_item[item_id].append(target_id)
+            self.target_offsets.append(len(self.target_item_ids))
+
+        self.item_offsets = array("q", [0])
+        self.item_target_ids = array("i")
+
+        for targets in targets_for_item:
+            self.item_target_ids.extend(targets)
+            self.item_offsets.append(len(self.item_target_ids))
+
+        self._target_rank = None
+        self._target_masks = None
+        self._target_sizes = None
+        self._item_counts = None
+        self._frequency_order = None
+
+    def __len__(self):
+        return len(self.targets)
+
+    def tokens_of(self, target_id):
+        """
+        the item ids of the given target, with repetitions
+        """
+        start, end = self.token_offsets[target_id : target_id + 2]  # noqa: E203
+        return memoryview(self.target_tokens)[start:end]
+
+    def items_of(self, target_id):
+        """
+        the distinct item ids of the given target, in order of first
+        appearance
+        """
+        start, end = self.target_offsets[target_id : target_id + 2]  # noqa: E203
+        return memoryview(self.target_item_ids)[start:end]
+
+    def targets_of(self, item_id):
+        """
+        the ids of the targets the given item appears in, in order
+        """
+        start, end = self.item_offsets[item_id : item_id + 2]  # noqa: E203
+        return memoryview(self.item_target_ids)[start:end]
+
+    def item_ids(self, items):
+        """
+        the set of ids of those of the given items that appear in the problem
+        """
+        item_index = self.item_index
+        return {item_index[item] for item in items if item in item_index}
+
+    def target_ids(self, targets):
+        """
+        the set of ids of those of the given targets that appear in the problem
+        """
+        target_index = self.target_index
+        return {target_index[target] for target in targets if target in target_index}
+
+    def target_rank(self):
+        """
+        an array giving the position of each target when the targets are
+        sorted, for visiting target ids in the order of `sorted(targets)`
+        """
+        if self._target_rank is None:
+            rank = array("i", [0]) * len(self.targets)
+            for position, target in enumerate(sorted(self.targets)):
+                rank[self.target_index[target]] = position
+            self._target_rank = rank
+        return self._target_rank
+
+    def target_masks(self):
+        """
+        a list giving, for each target, an int with the bits for its distinct
+        item ids set (see `sequencing_tools.bitset`)
+        """
+        if self._target_masks is None:
+            self._target_masks = [
+                mask(self.items_of(target_id)) for target_id in range(len(self))
+            ]
+        return self._target_masks
+
+    def target_sizes(self):
+        """
+        an array of the number of distinct items in each target
+        """
+        if self._target_sizes is None:
+            offsets = self.target_offsets
+            self._target_sizes = array("i", map(sub, offsets[1:], offsets[:-1]))
+        return self._target_sizes
+
+    def item_counts(self):
+        """
+        an array of the number of occurrences of each item over all the targets
+        """
+        if self._item_counts is None:
+            counts = array("i", [0]) * len(self.items)
+            for item_id in self.target_tokens:
+                counts[item_id] += 1
+            self._item_counts = counts
+        return self._item_counts
+
+    def precompute(self):
+        """
+        build everything the strategies share between runs now rather than on
+        first use (e.g. before forking worker processes that will share it)
+        """
+        self.target_rank()
+        self.target_masks()
+        self.target_sizes()
+        self.item_counts()
+        self.frequency_order()
+
+    # The starting state of a run is derived from the arrays above by taking
+    # away the items already known (and targets ignored), so many runs from
+    # different starting vocabularies share everything but what they change.
+
+    def missing_sets(self, known=frozenset(), ignored=frozenset()):
+        """
+        a dictionary mapping each target id not in `ignored` (in order) to a
+        set of its distinct item ids not in `known`
+        """
+        ids = self.target_item_ids
+        offsets = self.target_offsets
+        spans = enumerate(zip(offsets, offsets[1:]))
+        if not known:
+            return {
+                target_id: set(ids[start:end])
+                for target_id, (start, end) in spans
+                if target_id not in ignored
+            }
+        known = set(known)
+        return {
+            target_id: set(ids[start:end]) - known
+            for target_id, (start, end) in spans
+            if target_id not in ignored
+        }
+
+    def missing_counts(self, known=frozenset(), ignored=frozenset()):
+        """
+        a dictionary mapping each target id not in `ignored` (in order) to the
+        number of its distinct item ids not in `known`
+        """
+        # only the targets of the known items need counting again
+        missing = dict(enumerate(self.target_sizes()))
+        for target_id in ignored:
+            del missing[target_id]
+        for item_id in known:
+            for target_id in self.targets_of(item_id):
+                if target_id in missing:
+                    missing[target_id] -= 1
+        return missing
+
+    def targets_missing(self, known=frozenset(), ignored=frozenset()):
+        """
+        a dictionary mapping each item id not in `known` to an array of the
+        ids of the targets not in `ignored` it appears in, in order
+        """
+        ids = self.item_target_ids
+        offsets = self.item_offsets
+        spans = enumerate(zip(offsets, offsets[1:]))
+        if not ignored:
+            return {
+                item_id: ids[start:end]
+                for item_id, (start, end) in spans
+                if item_id not in known
+            }
+        return {
+            item_id: array(
+                "i",
+                (target_id for target_id in ids[start:end] if target_id not in ignored),
+            )
+            for item_id, (start, end) in spans
+            if item_id not in known
+        }
+
+    def frequency_order(self, known=frozenset(), ignored=frozenset()):
+        """
+        a list of the item ids not in `known`, most frequent (over the targets
+        not in `ignored`) first, with ties in order of first appearance (the
+        order of `collections.Counter.most_common`)
+        """
+        if self._frequency_order is None:
+            # ids are in order of first appearance, so a stable sort keeps
+            # ties in that order
+            self._frequency_order = sorted(
+                range(len(self.items)),
+                key=self.item_counts().__getitem__,
+                reverse=True,
+            )
+        if not ignored:
+            return [
+                item_id for item_id in self._frequency_order if item_id not in known
+            ]
+
+        # items first appearing in an ignored target come later, so count again
+        counts = collections.Counter()
+        for target_id in range(len(self)):
+            if target_id not in ignored:
+                counts.update(
+                    item_id
+                    for item_id in self.tokens_of(target_id)
+                    if item_id not in known
+                )
+        return [item_id for item_id, count in counts.most_common()]
+
+    def first_seen(self, known=frozenset(), ignored=frozenset()):
+        """
+        a dictionary giving a position for each item id not in `known`, in the
+        order the items are first encountered walking the targets not in
+        `ignored` and the items of each in order (which the strategies break
+        ties by). Only the order of the positions matters.
+        """
+        if not ignored:
+            # ids are given out in just that order
+            return {
+                item_id: item_id
+                for item_id in range(len(self.items))
+                if item_id not in known
+            }
+
+        first_seen = {}
+        for target_id in range(len(self)):
+            if target_id not in ignored:
+                for item_id in self.items_of(target_id):
+                    if item_id not in known and item_id not in first_seen:
+                        first_seen[item_id] = len(first_seen)
+        return first_seen
+
+    def vocabulary(self):
+        """
+        a `sequencing_tools.bitset.Vocabulary` of the items, with the same ids
+        """
+        return Vocabulary(self.items)
+
+
+def compile_problem(target_items):
+    """
+    Return `target_items` as a `Problem`, compiling it if it is a dictionary.
+    """
+    if isinstance(target_items, Problem):
+        return target_items
+    return Problem(target_items)
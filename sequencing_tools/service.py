@@ -0,0 +1,541 @@
+"""
+A local HTTP/JSON service recommending what each of many learners should
+read next.
+
+Each corpus (a combination of `gnt_data` token type, chunk type and chunk id
+prefixes) is compiled to a `Problem` the first time a learner needs it and
+then shared, read-only, by every learner using it. A learner only holds a
+`LearningModel` of the vocabulary they know and the set of targets they've
+seen, and each recommendation is what the chosen strategy yields starting
+from them. For the strategies with a resumable session (see
+`sequencing_tools.session`) the learner keeps one between requests rather
+than the strategy being run again from the start each time. A session only
+holds what differs for its learner (the rest is read from the shared
+`Problem`), and the sessions together are kept within a memory budget: when
+it's exceeded, the sessions used least recently are dropped and made again
+from the learner's model when next needed. The strategies run in a thread
+pool so the event loop carries on serving other learners meanwhile.
+
+Run it with
+
+    python -m sequencing_tools.service --port 8000
+
+and then (with bodies and responses as JSON):
+
+- `POST /learners` with `strategy`, `items`, `targets`, and optionally
+  `chunks` (id prefixes), `known` (items) and `seen` (targets) creates a
+  learner and returns its id as `learner`
+- `POST /learners/<id>/next` with an optional `count` (default 1) streams
+  that many recommendations as JSON lines of `target` and `items_to_learn`,
+  recording each target as seen and its items as known
+- `POST /learners/<id>/learn` with `items` records items learnt elsewhere
+- `POST /learners/<id>/skip` with `targets` records targets as seen
+- `GET /learners/<id>` describes a learner and `DELETE /learners/<id>`
+  forgets them
+- `GET /health` reports the number of learners, the number of sessions kept
+  and their size in bytes, and the corpora loaded
+
+See `load_test.py` for a load test.
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+from http import HTTPStatus
+import json
+import sys
+import uuid
+
+from . import ordering
+from .model import LearningModel
+from .problem import Problem
+from .session import FrequencyOptimisedSession, FrequencySession
+
+STRATEGIES = ["next_best", "frequency_optimised", "frequency", "next_best_approximate"]
+
+# the strategies a learner keeps a session of
+SESSIONS = {
+    "frequency_optimised": FrequencyOptimisedSession,
+    "frequency": FrequencySession,
+}
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_COUNT = 1000
+DEFAULT_MAX_LEARNERS = 10000
+DEFAULT_MAX_SESSION_BYTES = 512 * 2 ** 20
+
+
+class HTTPError(Exception):
+    """
+    An error to report to the client with the given status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def load_gnt_corpus(items, targets, chunks=()):
+    """
+    the `target_items` of the `gnt_data` corpus with the given `TokenType` name
+    as items and `ChunkType` name as targets, only including the chunks whose
+    id starts with one of `chunks` if any are given
+    """
+    from gnt_data import (
+        ChunkType,
+        TokenType,
+        chunk_data,
+        chunks_with_prefix,
+        get_tokens,
+        get_tokens_by_chunk,
+    )
+
+    for names, name in [(TokenType, items), (ChunkType, targets)]:
+        if name not in names.__members__:
+            raise ValueError(f"unknown {names.__name__} {name!r}")
+    token_type = TokenType[items]
+    chunk_type = ChunkType[targets]
+
+    if not chunks:
+        return get_tokens_by_chunk(token_type, chunk_type)
+
+    # the chunks with each prefix are looked up in the chunk index rather than
+    # checking every chunk id, then put back in corpus order
+    chunk_ids = {
+        chunk_id
+        for prefix in chunks
+        for chunk_id in chunks_with_prefix(chunk_type, prefix)
+    }
+    return {
+        chunk_id: get_tokens(token_type, chunk_type, chunk_id)
+        for chunk_id in sorted(
+            chunk_ids, key=lambda chunk_id: chunk_data[(chunk_type, chunk_id)]
+        )
+    }
+
+
+class Learner:
+    """
+    The state of one learner: the strategy and corpus they're following, the
+    vocabulary they know and the targets they've seen.
+    """
+
+    def __init__(self, strategy, corpus):
+        self.strategy = strategy
+        self.corpus = corpus
+        self.model = LearningModel(keep_tokens=False)
+        self.seen = set()
+
+        # the learner's session, if the strategy has one, made on the first
+        # request for a recommendation
+        self.session = None
+
+        # a learner's requests are handled one at a time
+        self.lock = asyncio.Lock()
+
+    def describe(self):
+        items, targets, chunks = self.corpus
+        return {
+            "strategy": self.strategy,
+            "items": items,
+            "targets": targets,
+            "chunks": list(chunks),
+            "known": self.model.vocab_size(),
+            "seen": len(self.seen),
+        }
+
+
+class SequencingService:
+    """
+    The state shared by all the connections: the compiled corpora and the
+    learners. `load_corpus(items, targets, chunks)` returns the
+    `target_items` of a corpus and `executor` runs the strategies (by
+    default, the event loop's default thread pool). The learners' sessions
+    are kept to about `max_session_bytes` in all.
+    """
+
+    def __init__(
+        self,
+        load_corpus=load_gnt_corpus,
+        executor=None,
+        max_learners=DEFAULT_MAX_LEARNERS,
+        max_session_bytes=DEFAULT_MAX_SESSION_BYTES,
+    ):
+        self.load_corpus = load_corpus
+        self.executor = executor
+        self.max_learners = max_learners
+        self.max_session_bytes = max_session_bytes
+
+        # corpus -> a future of its `Problem`, so concurrent requests for a
+        # corpus not yet loaded wait for the same one
+        self.problems = {}
+
+        self.learners = {}
+
+        # learner -> the size of their session, least recently used first
+        self.sessions = collections.OrderedDict()
+        self.session_bytes = 0
+
+    def _compile(self, corpus):
+        problem = Problem(self.load_corpus(*corpus))
+        # build the lazily computed indexes now so the problem is only read
+        # from here on
+        problem.precompute()
+        return problem
+
+    async def problem(self, corpus):
+        """
+        the `Problem` for the given corpus, compiled the first time it's asked
+        for
+        """
+        future = self.problems.get(corpus)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.problems[corpus] = asyncio.ensure_future(
+                loop.run_in_executor(self.executor, self._compile, corpus)
+            )
+        try:
+            return await asyncio.shield(future)
+        except Exception as error:
+            # let the corpus be tried again
+            if self.problems.get(corpus) is future:
+                del self.problems[corpus]
+            if isinstance(error, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, str(error))
+            raise
+
+    def keep_session(self, learner):
+        """
+        account for the learner's session (just used) and drop the sessions
+        used least recently by other learners while over the budget
+        """
+        self.drop_session(learner)
+        if learner.session is None:
+            return
+        self.sessions[learner] = size = sys.getsizeof(learner.session)
+        self.session_bytes += size
+        while self.session_bytes > self.max_session_bytes:
+            oldest = next(iter(self.sessions))
+            if oldest is learner:
+                break
+            self.drop_session(oldest)
+            oldest.session = None
+
+    def drop_session(self, learner):
+        """
+        stop accounting for the learner's session
+        """
+        self.session_bytes -= self.sessions.pop(learner, 0)
+
+    def learner(self, learner_id):
+        learner = self.learners.get(learner_id)
+        if learner is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no learner {learner_id!r}")
+        return learner
+
+    async def handle(self, reader, writer):
+        """
+        serve the requests on one connection
+        """
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as error:
+                    # the rest of the stream can't be trusted
+                    await respond(writer, error.status, {"error": str(error)})
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    await self.route(method, path, body, writer)
+                except HTTPError as error:
+                    await respond(writer, error.status, {"error": str(error)})
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, writer):
+        parts = path.split("?")[0].strip("/").split("/")
+
+        if parts == ["health"] and method == "GET":
+            await respond(writer, HTTPStatus.OK, self.health())
+        elif parts == ["learners"] and method == "POST":
+            await respond(writer, HTTPStatus.CREATED, await self.create(body))
+        elif len(parts) == 2 and parts[0] == "learners" and method == "GET":
+            await respond(writer, HTTPStatus.OK, self.learner(parts[1]).describe())
+        elif len(parts) == 2 and parts[0] == "learners" and method == "DELETE":
+            self.drop_session(self.learner(parts[1]))
+            del self.learners[parts[1]]
+            await respond(writer, HTTPStatus.OK, {})
+        elif len(parts) == 3 and parts[0] == "learners" and method == "POST":
+            learner = self.learner(parts[1])
+            async with learner.lock:
+                if parts[2] == "next":
+                    await self.next(learner, body, writer)
+                elif parts[2] == "learn":
+                    items = strings(body, "items")
+                    learner.model.learn_vocab(items)
+                    if learner.session is not None:
+                        learner.session.learn(items)
+                        self.keep_session(learner)
+                    await respond(writer, HTTPStatus.OK, learner.describe())
+                elif parts[2] == "skip":
+                    targets = strings(body, "targets")
+                    learner.seen.update(targets)
+                    if learner.session is not None:
+                        for target in targets:
+                            learner.session.skip(target)
+                        self.keep_session(learner)
+                    await respond(writer, HTTPStatus.OK, learner.describe())
+                else:
+                    raise HTTPError(HTTPStatus.NOT_FOUND, f"no such path {path!r}")
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no such path {method} {path!r}")
+
+    def health(self):
+        return {
+            "learners": len(self.learners),
+            "sessions": len(self.sessions),
+            "session_bytes": self.session_bytes,
+            "corpora": [
+                "/".join([items, targets, *chunks])
+                for (items, targets, chunks), future in self.problems.items()
+                if future.done() and not future.exception()
+            ],
+        }
+
+    async def create(self, body):
+        if len(self.learners) >= self.max_learners:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "too many learners")
+
+        strategy = body.get("strategy", "next_best")
+        if strategy not in STRATEGIES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown strategy {strategy!r}")
+        corpus = (
+            str(body.get("items", "lemma")),
+            str(body.get("targets", "verse")),
+            tuple(strings(body, "chunks")),
+        )
+        await self.problem(corpus)
+
+        learner = Learner(strategy, corpus)
+        learner.model.learn_vocab(strings(body, "known"))
+        learner.seen.update(strings(body, "seen"))
+
+        learner_id = uuid.uuid4().hex
+        self.learners[learner_id] = learner
+        return {"learner": learner_id, **learner.describe()}
+
+    async def next(self, learner, body, writer):
+        """
+        stream the next `count` recommendations for the learner, recording
+        each as it's sent
+        """
+        count = body.get("count", 1)
+        if not isinstance(count, int) or not 1 <= count <= MAX_COUNT:
+            raise HTTPError(
+                HTTPStatus.BAD_REQUEST, f"count must be from 1 to {MAX_COUNT}"
+            )
+
+        problem = await self.problem(learner.corpus)
+        loop = asyncio.get_running_loop()
+
+        session_type = SESSIONS.get(learner.strategy)
+        if session_type is None:
+            steps = getattr(ordering, learner.strategy)(
+                problem, learner.model.known_vocab(), True, frozenset(learner.seen)
+            )
+
+            def advance():
+                return next(steps, None)
+
+        else:
+            if learner.session is None:
+                learner.session = await loop.run_in_executor(
+                    self.executor,
+                    session_type,
+                    problem,
+                    learner.model.known_vocab(),
+                    learner.seen,
+                )
+                self.keep_session(learner)
+            advance = learner.session.advance
+
+        await start_stream(writer, HTTPStatus.OK)
+        try:
+            for i in range(count):
+                # each step runs in the executor (the generator or session is
+                # only ever used by one thread at a time)
+                step = await loop.run_in_executor(self.executor, advance)
+                if step is None:
+                    break
+                target, items_to_learn = step
+                learner.model.learn_vocab(items_to_learn)
+                learner.seen.add(target)
+                await write_chunk(
+                    writer,
+                    {"target": target, "items_to_learn": sorted(items_to_learn)},
+                )
+        except ConnectionError:
+            raise
+        except Exception as error:
+            # the status has already been sent, so the error goes in the body
+            # (and a session left part way through a step is made again from
+            # the learner next time)
+            learner.session = None
+            await write_chunk(writer, {"error": str(error) or type(error).__name__})
+        if session_type is not None:
+            # the session has grown (or been dropped to make room for another)
+            self.keep_session(learner)
+        await end_stream(writer)
+
+
+def strings(body, key):
+    """
+    the list of strings under `key` in the request body (empty if missing)
+    """
+    values = body.get(key, [])
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{key} must be a list of strings")
+    return values
+
+
+async def read_request(reader):
+    """
+    read a request from the stream as `(method, path, headers, body)` with
+    the body parsed as JSON (or None at the end of the stream)
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+    body = {}
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "request body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "request body must be an object")
+
+    return method, path, headers, body
+
+
+def status_line(status):
+    status = HTTPStatus(status)
+    return f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+
+
+async def respond(writer, status, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        (
+            status_line(status) + "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode("latin-1")
+        + data
+    )
+    await writer.drain()
+
+
+async def start_stream(writer, status):
+    writer.write(
+        (
+            status_line(status) + "Content-Type: application/x-ndjson\r\n"
+            "Transfer-Encoding: chunked\r\n\r\n"
+        ).encode("latin-1")
+    )
+    await writer.drain()
+
+
+async def write_chunk(writer, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+    await writer.drain()
+
+
+async def end_stream(writer):
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def serve(host, port, service):
+    server = await asyncio.start_server(service.handle, host, port)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"serving on http://{host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sequencing_tools.service",
+        description="serve reading recommendations for many learners over HTTP",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 for any free port")
+    parser.add_argument(
+        "--threads", type=int, help="the number of threads running the strategies"
+    )
+    parser.add_argument(
+        "--max-session-mb",
+        type=float,
+        default=DEFAULT_MAX_SESSION_BYTES / 2 ** 20,
+        help="the memory budget for all the sessions in MB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--preload",
+        nargs="*",
+        default=[],
+        metavar="ITEMS/TARGETS",
+        help="corpora to compile before serving, e.g. lemma/verse",
+    )
+    args = parser.parse_args(argv)
+
+    executor = concurrent.futures.ThreadPoolExecutor(args.threads)
+    service = SequencingService(
+        executor=executor, max_session_bytes=int(args.max_session_mb * 2 ** 20)
+    )
+
+    async def run():
+        for name in args.preload:
+            items, targets, *chunks = name.split("/")
+            await service.problem((items, targets, tuple(chunks)))
+        await serve(args.host, args.port, service)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""
+Resumable ordering sessions.
+
+A session holds the state of a learner working through the targets of a
+problem: the items known and the targets already seen (or skipped). Each call
+to `advance` returns exactly what
+
+    next(strategy(target_items, items_known, True, targets_seen))
+
+would, and then records the target as seen and its items as known, but the
+indexes behind it are updated incrementally rather than rebuilt over the whole
+corpus. Items learnt some other way can be added with `learn` and targets
+passed over with `skip` at any point.
+
+e.g.
+
+    session = FrequencyOptimisedSession(target_items)
+    target, items_to_learn = session.advance()
+    session.learn(["λέγω"])
+    session.skip("640316")
+    target, items_to_learn = session.advance()
+
+A session only keeps what differs for its learner: it reads the targets of
+each item, the items of each target and the frequency order from the
+`Problem` (which many sessions can share) and holds an array of the number of
+items each target is missing plus whatever has changed for the items in the
+targets seen. So many sessions over one problem stay small.
+
+There is no session for `next_best`: to find its next target it tries
+learning the highest scoring items until one completes a target, and all but
+that target's items are then forgotten again. The items it tries are mostly
+the most frequent ones, which are tried (and undone) again at every step, so
+keeping the state between steps saves next to nothing over calling it
+again.
+"""
+
+import abc
+from array import array
+import heapq
+import sys
+
+from .problem import compile_problem
+
+
+class Session(abc.ABC):
+    """
+    The state shared by sessions for each strategy. Subclasses implement
+    `_step` to choose the next target when no target is already readable.
+    """
+
+    def __init__(
+        self,
+        target_items,
+        items_already_known=set(),
+        targets_to_ignore=set(),
+    ):
+        self.problem = problem = compile_problem(target_items)
+
+        # the ids of items known and targets seen (or skipped)
+        self.known = problem.item_ids(items_already_known)
+        self.seen = problem.target_ids(targets_to_ignore)
+
+        # the number of distinct items of each target not yet known
+        self.missing = array("i", problem.target_sizes())
+        for item in self.known:
+            for target in problem.targets_of(item):
+                self.missing[target] -= 1
+
+        # a heap of ids of targets not yet seen with no items missing
+        self.ready = [
+            target
+            for target in range(len(problem))
+            if self.missing[target] == 0 and target not in self.seen
+        ]
+
+        # for each item whose first target was seen, how far along its
+        # targets the first target not yet seen is
+        self.first_index = {}
+
+    def advance(self):
+        """
+        Return the next target along with a set of the items for that target
+        that have not yet been learnt (or None if there are no targets left)
+        and record the target as seen and the items as known.
+        """
+        TARGETS = self.problem.targets
+        ITEMS = self.problem.items
+
+        # targets readable with the items already known come first
+        while self.ready:
+            target = heapq.heappop(self.ready)
+            if target not in self.seen:
+                self._see(target)
+                return TARGETS[target], set()
+
+        step = self._step()
+        if step is None:
+            return None
+
+        target, items_to_learn = step
+        for item in items_to_learn:
+            self._learn(item)
+        self._see(target)
+
+        return TARGETS[target], {ITEMS[item] for item in items_to_learn}
+
+    def __iter__(self):
+        while True:
+            step = self.advance()
+            if step is None:
+                break
+            yield step
+
+    def __sizeof__(self):
+        # only the session's own state, not the problem it shares
+        return (
+            super().__sizeof__()
+            + sys.getsizeof(self.known)
+            + sys.getsizeof(self.seen)
+            + sys.getsizeof(self.missing)
+            + sys.getsizeof(self.ready)
+            + sys.getsizeof(self.first_index)
+        )
+
+    def learn(self, items):
+        """
+        Record the given items as known (having been learnt externally).
+        """
+        for item in self.problem.item_ids(items):
+            self._learn(item)
+
+    def skip(self, target):
+        """
+        Record the given target as seen so it won't be returned.
+        """
+        target = self.problem.target_index.get(target)
+        if target is not None and target not in self.seen:
+            self._see(target)
+
+    @abc.abstractmethod
+    def _step(self):
+        """
+        Return the id of the next target along with the ids of the items to
+        learn for it, or None if there are no targets left.
+        """
+
+    def _learn(self, item):
+        if item in self.known:
+            return
+        self.known.add(item)
+        for target in self.problem.targets_of(item):
+            self.missing[target] -= 1
+            if self.missing[target] == 0 and target not in self.seen:
+                heapq.heappush(self.ready, target)
+
+    def _see(self, target):
+        self.seen.add(target)
+
+    def _missing_items(self, target):
+        """
+        the ids of the items of the given target not yet known
+        """
+        KNOWN = self.known
+        return [item for item in self.problem.items_of(target) if item not in KNOWN]
+
+    def _first_target(self, item):
+        """
+        the id of the first target not yet seen containing the given item (or
+        None if there isn't one)
+        """
+        targets = self.problem.targets_of(item)
+        index = self.first_index.get(item, 0)
+        while index < len(targets) and targets[index] in self.seen:
+            index += 1
+        self.first_index[item] = index
+        return targets[index] if index < len(targets) else None
+
+
+class FrequencySession(Session):
+    """
+    A resumable `sequencing_tools.ordering.frequency`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # items are taken in order of the number of occurrences in the targets
+        # not yet seen, with ties going to the item occurring first. Until a
+        # target an item occurs in is seen that is its place in the
+        # problem's `frequency_order`, which is gone through in turn...
+        self.order = self.problem.frequency_order()
+        self.next_in_order = 0
+
+        # ...and the items occurring in a target seen are taken from a heap of
+        # `(-count, target, position, item)` by their count and the target
+        # and position of their first occurrence in the targets not yet seen
+        self.counts = {}
+        self.first = {}
+        self.heap = []
+
+        self._drop(self.seen)
+
+    def __sizeof__(self):
+        return (
+            super().__sizeof__()
+            + sys.getsizeof(self.counts)
+            + sys.getsizeof(self.first)
+            + len(self.first) * sys.getsizeof((0, 0))
+            + sys.getsizeof(self.heap)
+            + len(self.heap) * sys.getsizeof((0, 0, 0, 0))
+        )
+
+    def _entry(self, item):
+        """
+        the heap entry of an item whose targets have none seen
+        """
+        target = self.problem.targets_of(item)[0]
+        position = self.problem.tokens_of(target).tolist().index(item)
+        return -self.problem.item_counts()[item], target, position, item
+
+    def _top(self):
+        """
+        the entry of the item to learn next and whether it's on the heap (or
+        None if there are no items left)
+        """
+        # skip the items in the order that are known or occur in a target seen
+        ORDER = self.order
+        while self.next_in_order < len(ORDER) and (
+            ORDER[self.next_in_order] in self.known
+            or ORDER[self.next_in_order] in self.counts
+        ):
+            self.next_in_order += 1
+
+        # discard heap entries made stale by a change in count or first
+        # occurrence or the item being learnt
+        while self.heap:
+            neg_count, target, position, item = self.heap[0]
+            if (
+                item not in self.known
+                and self.counts.get(item) == -neg_count
+                and self.first.get(item) == (target, position)
+            ):
+                break
+            heapq.heappop(self.heap)
+
+        best = None
+        if self.next_in_order < len(ORDER):
+            best = self._entry(ORDER[self.next_in_order]), False
+        if self.heap and (best is None or self.heap[0] < best[0]):
+            best = self.heap[0], True
+        return best
+
+    def _pop(self):
+        """
+        remove and return the entry of the item to learn next and whether it
+        was on the heap (or None if there are no items left)
+        """
+        top = self._top()
+        if top is not None:
+            if top[1]:
+                heapq.heappop(self.heap)
+            else:
+                self.next_in_order += 1
+        return top
+
+    def _learn(self, item):
+        super()._learn(item)
+        self.counts.pop(item, None)
+        self.first.pop(item, None)
+
+    def _see(self, target):
+        super()._see(target)
+        self._drop([target])
+
+    def _drop(self, targets):
+        """
+        take the occurrences of items in the given targets (just seen) out of
+        their counts
+        """
+        COUNTS = self.problem.item_counts()
+        changed = set()
+        for target in targets:
+            for item in self.problem.tokens_of(target):
+                if item not in self.known:
+                    self.counts[item] = self.counts.get(item, COUNTS[item]) - 1
+                    changed.add(item)
+
+        for item in changed:
+            if self.counts[item] == 0:
+                self.first.pop(item, None)
+                continue
+            if item not in self.first or self.first[item][0] in self.seen:
+                first_target = self._first_target(item)
+                tokens = self.problem.tokens_of(first_target).tolist()
+                self.first[item] = (first_target, tokens.index(item))
+            heapq.heappush(self.heap, (-self.counts[item], *self.first[item], item))
+
+    def _completes(self, item):
+        """
+        the first target (in the order `frequency` visits them) that learning
+        the given item would leave with nothing missing, if any
+        """
+        for target in self.problem.targets_of(item):
+            if self.missing[target] == 1 and target not in self.seen:
+                return target
+        return None
+
+    def _step(self):
+        items_to_learn = []
+        while True:
+            top = self._pop()
+            if top is None:
+                return None
+            item = top[0][-1]
+            items_to_learn.append(item)
+            completed = self._completes(item)
+            self._learn(item)
+            if completed is not None:
+                return completed, items_to_learn
+
+
+class FrequencyOptimisedSession(FrequencySession):
+    """
+    A resumable `sequencing_tools.ordering.frequency_optimised`.
+    """
+
+    def _step(self):
+        # go through the items in frequency order until a target would have
+        # nothing missing, but only that target's items are actually learnt
+        # so the rest are put back
+        next_in_order = self.next_in_order
+        popped = []
+        remaining = {}
+        completed = None
+
+        while completed is None:
+            top = self._pop()
+            if top is None:
+                break
+            popped.append(top)
+            for target in self.problem.targets_of(top[0][-1]):
+                if target in self.seen:
+                    continue
+                remaining[target] = remaining.get(target, self.missing[target]) - 1
+                if remaining[target] == 0:
+                    completed = target
+                    break
+
+        self.next_in_order = next_in_order
+        for entry, on_heap in popped:
+            if on_heap:
+                heapq.heappush(self.heap, entry)
+
+        if completed is None:
+            return None
+        return completed, self._missing_items(completed)
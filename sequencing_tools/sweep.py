@@ -0,0 +1,270 @@
+"""
+Run the ordering strategies over many configurations in a process pool.
+
+A configuration is a strategy, a corpus and a starting set of items already
+known (such as the vocabulary of the first few chapters of a textbook).
+Results are generated as each run finishes, e.g.
+
+    starting_sets = {"none": set(), "croy": croy_vocab}
+    for result in sweep(
+        configs(STRATEGIES, gnt_corpora(), starting_sets),
+        load_gnt_corpus,
+        starting_sets,
+    ):
+        print(result["strategy"], result["corpus"], result["known"], result["seconds"])
+
+A configuration that fails (say its corpus can't be loaded or its strategy
+raises) doesn't stop the others: its result has the `error` instead.
+
+Corpora are named and loaded in the workers by `load_corpus(name)` (which
+must be a module-level function so it can be sent to them). Where processes
+can be forked, each corpus is compiled to a `Problem` once before the pool
+starts and the workers share its arrays (which are only ever read) rather
+than being sent a copy. Otherwise each worker compiles a corpus the first
+time it needs it, which for `load_gnt_corpus` means reading the memory-mapped
+`gnt_data` cache shared by every process.
+
+`orderings` is for the other common case of one strategy and corpus but many
+starting sets, such as generating a personalised sequence for each of many
+learners who have learnt different amounts of a textbook:
+
+    for learner, steps in orderings("next_best", target_items, known_by_learner):
+        ...
+
+The corpus is compiled once and everything the strategies share between runs
+is built before any of them start (see `Problem.precompute`), so each run only
+takes its learner's known items away from that rather than going through the
+whole corpus again.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import os
+import time
+
+from . import ordering
+from .problem import compile_problem
+
+STRATEGIES = ["frequency", "frequency_optimised", "next_best"]
+
+Config = collections.namedtuple("Config", ["strategy", "corpus", "known"])
+
+
+def configs(strategies, corpora, starting_sets):
+    """
+    a list of a `Config` for every combination of the given strategy names,
+    corpus names and names of starting sets
+    """
+    return [
+        Config(*combination)
+        for combination in itertools.product(strategies, corpora, starting_sets)
+    ]
+
+
+def gnt_corpora():
+    """
+    the names of the `gnt_data` corpora, one per combination of `TokenType`
+    (the items) and `ChunkType` (the targets), for `load_gnt_corpus`
+    """
+    from gnt_data import ChunkType, TokenType
+
+    return [
+        f"{token_type.name}/{chunk_type.name}"
+        for token_type in TokenType
+        for chunk_type in ChunkType
+    ]
+
+
+def load_gnt_corpus(name):
+    """
+    the `target_items` for a corpus named by `gnt_corpora`
+    """
+    from gnt_data import ChunkType, TokenType, get_tokens_by_chunk
+
+    token_type, chunk_type = name.split("/")
+    return get_tokens_by_chunk(TokenType[token_type], ChunkType[chunk_type])
+
+
+# the state of each worker (or of the parent before forking)
+_WORKER = {}
+
+
+def _init_worker(load_corpus, starting_sets, limit, keep_order):
+    _WORKER.update(
+        load_corpus=load_corpus,
+        starting_sets=starting_sets,
+        limit=limit,
+        keep_order=keep_order,
+        problems={},
+    )
+
+
+def _problem(corpus):
+    problems = _WORKER["problems"]
+    if corpus not in problems:
+        problem = compile_problem(_WORKER["load_corpus"](corpus))
+        problem.precompute()
+        problems[corpus] = problem
+    return problems[corpus]
+
+
+def _run(config):
+    try:
+        return run(
+            config,
+            _problem(config.corpus),
+            _WORKER["starting_sets"][config.known],
+            _WORKER["limit"],
+            _WORKER["keep_order"],
+        )
+    except Exception as error:
+        return {
+            **config._asdict(),
+            "steps": None,
+            "items": None,
+            "seconds": None,
+            "error": f"{type(error).__name__}: {error}",
+        }
+
+
+def run(config, target_items, items_already_known=set(), limit=None, keep_order=False):
+    """
+    Run the strategy of the given `Config` over `target_items` (stopping after
+    `limit` targets if given) and return a dictionary of the configuration,
+    the number of targets yielded (`steps`) and items learnt, the time taken
+    and, if `keep_order`, the list of targets in order.
+    """
+    strategy = getattr(ordering, config.strategy)
+    steps = 0
+    items = 0
+    order = []
+
+    start = time.perf_counter()
+    for target, items_to_learn in itertools.islice(
+        strategy(target_items, items_already_known), limit
+    ):
+        steps += 1
+        items += len(items_to_learn)
+        if keep_order:
+            order.append(target)
+    seconds = time.perf_counter() - start
+
+    result = {
+        **config._asdict(),
+        "steps": steps,
+        "items": items,
+        "seconds": seconds,
+    }
+    if keep_order:
+        result["order"] = order
+    return result
+
+
+def sweep(
+    configs,
+    load_corpus,
+    starting_sets={"none": set()},
+    processes=None,
+    limit=None,
+    keep_order=False,
+):
+    """
+    Generate the result of `run` for each of `configs` (in the order they
+    finish) using a pool of `processes` worker processes (by default, one
+    per CPU). `starting_sets` maps the `known` names used in `configs` to
+    sets of items.
+
+    If a configuration raises an exception, its result has the configuration
+    and an `error` describing the exception (with `steps`, `items` and
+    `seconds` None) and the others carry on.
+
+    With `processes=1` the configurations are run one after the other in
+    this process, which is handy for debugging.
+    """
+    configs = list(configs)
+    state = (load_corpus, starting_sets, limit, keep_order)
+
+    try:
+        if processes == 1:
+            _init_worker(*state)
+            yield from map(_run, configs)
+            return
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            # compile each corpus once here for the forked workers to share
+            _init_worker(*state)
+            for corpus in dict.fromkeys(config.corpus for config in configs):
+                try:
+                    _problem(corpus)
+                except Exception:
+                    # reported by each of its configurations when they run
+                    pass
+            pool = multiprocessing.get_context("fork").Pool(processes)
+        else:
+            pool = multiprocessing.get_context().Pool(processes, _init_worker, state)
+
+        with pool:
+            yield from pool.imap_unordered(_run, configs)
+    finally:
+        _WORKER.clear()
+
+
+def _init_orderings(strategy, problem, limit, kwargs):
+    # (already done if the problem was built before forking)
+    problem.precompute()
+    _WORKER.update(
+        strategy=getattr(ordering, strategy),
+        problem=problem,
+        limit=limit,
+        kwargs=kwargs,
+    )
+
+
+def _ordering(task):
+    name, items_already_known = task
+    steps = _WORKER["strategy"](
+        _WORKER["problem"], items_already_known, **_WORKER["kwargs"]
+    )
+    return name, list(itertools.islice(steps, _WORKER["limit"]))
+
+
+def orderings(
+    strategy, target_items, starting_sets, processes=None, limit=None, **kwargs
+):
+    """
+    Generate `(name, steps)` for each of `starting_sets` (a dictionary mapping
+    names, such as of learners, to sets of items already known) in the order
+    they finish, where `steps` is a list of the `(target, items_to_learn)`
+    pairs the strategy with the given name yields for `target_items` (a
+    dictionary or `Problem`) from that starting set, stopping after `limit`
+    targets if given. Any other keyword arguments (such as
+    `targets_to_ignore`) are passed to the strategy.
+
+    The runs use a pool of `processes` worker processes (by default, one per
+    CPU) which, where processes can be forked, share the compiled problem
+    rather than being sent a copy. With `processes=1` they are run one after
+    the other in this process.
+    """
+    problem = compile_problem(target_items)
+    tasks = list(starting_sets.items())
+    state = (strategy, problem, limit, kwargs)
+
+    try:
+        if processes == 1:
+            _init_orderings(*state)
+            yield from map(_ordering, tasks)
+            return
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            _init_orderings(*state)
+            pool = multiprocessing.get_context("fork").Pool(processes)
+        else:
+            pool = multiprocessing.get_context().Pool(processes, _init_orderings, state)
+
+        # send the starting sets in batches as each run can be quick
+        chunksize = max(1, len(tasks) // (4 * (processes or os.cpu_count() or 1)))
+        with pool:
+            yield from pool.imap_unordered(_ordering, tasks, chunksize)
+    finally:
+        _WORKER.clear()
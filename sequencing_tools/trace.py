@@ -0,0 +1,162 @@
+"""
+Per-step instrumentation of the strategies in `sequencing_tools.ordering`.
+
+Pass a `Trace` as the `trace` argument of a strategy and it records, for each
+step (each item learnt):
+
+- `item`: the item learnt
+- `seconds`: the time spent in the strategy (not in the code consuming it)
+- `targets_touched`: the number of targets the item was removed from
+- `items_scored`: the number of items whose score changed
+- `set_operations`: the number of additions to and removals from sets
+- `missing_targets`: the number of targets still missing items afterwards
+- `targets_yielded`: the number of targets yielded
+
+e.g.
+
+    trace = Trace()
+    for target, items_to_learn in next_best(target_items, trace=trace):
+        ...
+    with open("trace.csv", "w") as f:
+        trace.write_csv(f)
+
+Without a trace the strategies only check for one at each step, so there is
+no measurable cost.
+"""
+
+import csv
+import json
+import time
+
+FIELDS = [
+    "step",
+    "item",
+    "seconds",
+    "targets_touched",
+    "items_scored",
+    "set_operations",
+    "missing_targets",
+    "targets_yielded",
+]
+
+
+class Trace:
+    """
+    The steps recorded from a strategy, kept as a list per field in `columns`.
+
+    If given, `callback` is called with a dictionary of the fields of each
+    step as it is recorded.
+    """
+
+    def __init__(self, callback=None):
+        self.columns = {field: [] for field in FIELDS}
+        self.callback = callback
+        self.setup_seconds = None
+        self._mark = None
+        self._paused = 0
+        self._pause_start = None
+        self._yielded = 0
+
+    def begin(self):
+        """
+        called by the strategy when it starts
+        """
+        self._mark = time.perf_counter()
+        self._paused = 0
+        self._yielded = 0
+
+    def ready(self):
+        """
+        called by the strategy once its initial data structures are built
+        """
+        now = time.perf_counter()
+        self.setup_seconds = now - self._mark - self._paused
+        self._mark = now
+        self._paused = 0
+
+    def pause(self):
+        """
+        called by the strategy just before it yields a target
+        """
+        self._pause_start = time.perf_counter()
+        self._yielded += 1
+
+    def resume(self):
+        """
+        called by the strategy when it is resumed after yielding a target
+        """
+        self._paused += time.perf_counter() - self._pause_start
+
+    def step(
+        self, item, targets_touched, items_scored, set_operations, missing_targets
+    ):
+        """
+        called by the strategy at the end of each step
+        """
+        now = time.perf_counter()
+        record = {
+            "step": len(self),
+            "item": item,
+            "seconds": now - self._mark - self._paused,
+            "targets_touched": targets_touched,
+            "items_scored": items_scored,
+            "set_operations": set_operations,
+            "missing_targets": missing_targets,
+            "targets_yielded": self._yielded,
+        }
+        for field, value in record.items():
+            self.columns[field].append(value)
+        self._mark = now
+        self._paused = 0
+        self._yielded = 0
+        if self.callback is not None:
+            self.callback(record)
+
+    def __len__(self):
+        return len(self.columns["step"])
+
+    def records(self):
+        """
+        generate a dictionary of the fields of each step
+        """
+        for values in zip(*self.columns.values()):
+            yield dict(zip(FIELDS, values))
+
+    def summary(self, top=10):
+        """
+        a dictionary of the totals of each numeric field, the setup time and
+        the `top` slowest steps
+        """
+        totals = {
+            field: sum(self.columns[field])
+            for field in FIELDS
+            if field not in ("step", "item", "missing_targets")
+        }
+        slowest = sorted(
+            self.records(), key=lambda record: record["seconds"], reverse=True
+        )[:top]
+        return {
+            "steps": len(self),
+            "setup_seconds": self.setup_seconds,
+            "totals": totals,
+            "slowest": slowest,
+        }
+
+    def write_csv(self, f):
+        """
+        write the steps to the text file object `f` as CSV with a header row
+        """
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(zip(*self.columns.values()))
+
+    def write_json(self, f):
+        """
+        write the setup time and the columns to the text file object `f` as
+        JSON
+        """
+        json.dump(
+            {"setup_seconds": self.setup_seconds, "columns": self.columns},
+            f,
+            ensure_ascii=False,
+        )
@@ -0,0 +1,64 @@
+import json
+
+import benchmark
+from sequencing_tools import ordering
+
+
+def test_failing_run_is_recorded(tmp_path, monkeypatch):
+    def broken(target_items, *args, **kwargs):
+        raise OverflowError("int too large to convert to float")
+        yield
+
+    monkeypatch.setattr(ordering, "next_best", broken)
+    output = str(tmp_path / "results.json")
+    benchmark.main(
+        [
+            "--no-gnt",
+            "--no-calc",
+            "--no-memory",
+            "--synthetic-targets",
+            "50",
+            "60",
+            "--synthetic-items",
+            "100",
+            "--output",
+            output,
+        ]
+    )
+
+    with open(output) as f:
+        results = json.load(f)["results"]
+    assert len(results) == 6
+    for result in results:
+        if result["name"] == "next_best":
+            assert result["error"] == "OverflowError: int too large to convert to float"
+            assert result["seconds"] is None
+        else:
+            assert "error" not in result
+            assert result["steps"] > 0
+
+
+def test_results_are_saved_as_they_finish(tmp_path, monkeypatch):
+    output = str(tmp_path / "results.json")
+    saved = []
+
+    def save(path, args, started, results):
+        saved.append(len(results))
+
+    monkeypatch.setattr(benchmark, "save", save)
+    benchmark.main(
+        [
+            "--no-gnt",
+            "--no-memory",
+            "--strategies",
+            "frequency",
+            "--synthetic-targets",
+            "50",
+            "--synthetic-items",
+            "100",
+            "--output",
+            output,
+        ]
+    )
+    # the strategy and then each of the calc functions
+    assert saved == [1, 2, 3, 4, 5, 6]
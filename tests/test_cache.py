@@ -0,0 +1,81 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from sequencing_tools import ordering
+from sequencing_tools.cache import OrderingCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a corpus with many targets completed by the same item, so the order in
+# which they are visited matters
+RUN = textwrap.dedent(
+    """
+    import itertools, json, random, sys
+    from sequencing_tools import ordering
+    from sequencing_tools.cache import OrderingCache
+
+    rng = random.Random(0)
+    items = [f"item{i}" for i in range(40)]
+    target_items = {
+        f"target{i}": rng.sample(items[: rng.randint(2, 40)], 2) for i in range(300)
+    }
+    strategy = getattr(ordering, sys.argv[2])
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    steps = OrderingCache(sys.argv[1]).run(strategy, target_items)
+    json.dump(
+        [[target, sorted(items)] for target, items in itertools.islice(steps, limit)],
+        sys.stdout,
+    )
+    """
+)
+
+
+def run(directory, seed, *args):
+    output = subprocess.run(
+        [sys.executable, "-c", RUN, str(directory), *args],
+        env={**os.environ, "PYTHONHASHSEED": str(seed), "PYTHONPATH": ROOT},
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+@pytest.mark.parametrize(
+    "strategy", ["frequency", "frequency_optimised", "next_best"]
+)
+def test_partial_ordering_extended_under_another_hash_seed(tmp_path, strategy):
+    full = run(tmp_path / "uncached", 3, strategy)
+
+    assert run(tmp_path / "cache", 1, strategy, "20") == full[:20]
+    extended = run(tmp_path / "cache", 2, strategy, "200")
+    assert extended == full[:200]
+    assert len({target for target, items in extended}) == len(extended)
+
+    # and what was stored is the same again
+    assert run(tmp_path / "cache", 4, strategy) == full
+
+
+def test_strategy_not_repeating_partial_ordering(tmp_path):
+    cache = OrderingCache(str(tmp_path))
+    target_items = {"a": ["x"], "b": ["y"], "c": ["z"]}
+    runs = []
+
+    def strategy(target_items, *args, **kwargs):
+        runs.append(1)
+        steps = list(ordering.frequency(target_items, *args, **kwargs))
+        return iter(steps if len(runs) == 1 else steps[::-1])
+
+    first = list(itertools.islice(cache.run(strategy, target_items), 2))
+    assert len(cache.entries()) == 1
+
+    steps = cache.run(strategy, target_items)
+    assert list(itertools.islice(steps, 2)) == first
+    with pytest.raises(RuntimeError):
+        next(steps)
+    assert cache.entries() == []
@@ -0,0 +1,42 @@
+from collections import Counter
+
+import pytest
+
+from sequencing_tools.model import LearningModel
+
+FIRST = [{"lemma": "ὁ"}, {"lemma": "λόγος"}]
+SECOND = [{"lemma": "ὁ"}, {"lemma": "θεός"}]
+
+
+@pytest.mark.parametrize("keep_tokens", [True, False])
+def test_seen_counts_stay_up_to_date(keep_tokens):
+    lm = LearningModel(keep_tokens=keep_tokens)
+    lm.read(FIRST)
+    seen = lm.seen("lemma")
+    before = seen.copy()
+    lm.read(SECOND)
+
+    assert seen == Counter({"ὁ": 2, "λόγος": 1, "θεός": 1})
+    assert lm.seen("lemma") - before == Counter({"ὁ": 1, "θεός": 1})
+
+
+def test_seen_can_only_be_changed_by_reading():
+    lm = LearningModel()
+    lm.read(FIRST)
+    seen = lm.seen("lemma")
+
+    with pytest.raises(TypeError):
+        seen["ὁ"] += 1
+    with pytest.raises(TypeError):
+        seen.update(["θεός"])
+
+    # in-place operators give a new Counter and leave the model's alone
+    total = seen
+    total += Counter(["θεός"])
+    assert type(total) is Counter
+    assert total == Counter({"ὁ": 1, "λόγος": 1, "θεός": 1})
+    assert lm.seen("lemma") == Counter({"ὁ": 1, "λόγος": 1})
+
+    copy = seen.copy()
+    copy["ὁ"] += 1
+    assert copy["ὁ"] == 2
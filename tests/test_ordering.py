@@ -0,0 +1,17 @@
+from sequencing_tools.ordering import next_best
+
+
+def test_next_best_long_target():
+    # a target missing more than 1023 items has a weight too small for a
+    # float power of two, and its items all tie so their float scores are
+    # compared
+    target_items = {
+        "long": [f"x{i}" for i in range(1100)],
+        "short": ["x0", "y"],
+        "other": ["y", "z"],
+    }
+    steps = list(next_best(target_items))
+
+    assert sorted(target for target, items in steps) == ["long", "other", "short"]
+    learnt = [item for target, items in steps for item in items]
+    assert len(learnt) == len(set(learnt)) == 1102
@@ -0,0 +1,30 @@
+import pytest
+
+from gnt_data.records import TokenRecords
+
+FIELDS = ["text", "lemma"]
+COLUMNS = {
+    "text": ["ἐν", "ἀρχῇ", "ἦν", "ὁ", "λόγος"],
+    "lemma": ["ἐν", "ἀρχή", "εἰμί", "ὁ", "λόγος"],
+}
+DICTS = [
+    {field: COLUMNS[field][i] for field in FIELDS} for i in range(len(COLUMNS["text"]))
+]
+
+
+def test_records_compare_like_lists():
+    records = TokenRecords(COLUMNS, FIELDS)
+
+    assert records == TokenRecords({k: list(v) for k, v in COLUMNS.items()}, FIELDS)
+    assert records == DICTS
+    assert DICTS == records
+    assert records[1:3] == DICTS[1:3]
+    assert records[1:3] != records[2:4]
+    assert records[:0] == []
+    assert records != DICTS[:-1]
+    assert records != "not a list"
+
+
+def test_records_are_unhashable():
+    with pytest.raises(TypeError):
+        hash(TokenRecords(COLUMNS, FIELDS))
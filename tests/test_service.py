@@ -0,0 +1,83 @@
+import asyncio
+import json
+import random
+
+from sequencing_tools import ordering
+from sequencing_tools.service import SequencingService
+
+rng = random.Random(0)
+VOCAB = [f"w{i}" for i in range(60)]
+CORPUS = {
+    f"t{i:03}": rng.choices(VOCAB[: rng.randint(5, 60)], k=rng.randint(2, 8))
+    for i in range(100)
+}
+
+
+def load_corpus(items, targets, chunks):
+    return CORPUS
+
+
+class Writer:
+    """
+    collects what's written by the service, reading back the JSON lines
+    """
+
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def lines(self):
+        return [
+            json.loads(line)
+            for line in self.data.split(b"\r\n")
+            if line.startswith(b"{")
+        ]
+
+
+async def recommend(service, strategies):
+    learners = [
+        (await service.create({"strategy": strategy}))["learner"]
+        for strategy in strategies
+    ]
+    steps = {learner_id: [] for learner_id in learners}
+    # take turns so each learner's session is dropped to make room for the
+    # next and made again from their model
+    for i in range(5):
+        for learner_id in learners:
+            writer = Writer()
+            await service.next(service.learners[learner_id], {"count": 3}, writer)
+            steps[learner_id] += writer.lines()
+    return learners, steps
+
+
+def test_sessions_are_dropped_over_the_budget():
+    strategies = ["frequency", "frequency_optimised"] * 2
+    service = SequencingService(load_corpus, max_session_bytes=1)
+    learners, steps = asyncio.run(recommend(service, strategies))
+
+    # only the session just used is kept
+    assert list(service.sessions) == [service.learners[learners[-1]]]
+    assert service.session_bytes == service.sessions[service.learners[learners[-1]]]
+    sessions = [service.learners[learner_id].session for learner_id in learners]
+    assert [session is None for session in sessions] == [True, True, True, False]
+
+    for learner_id, strategy in zip(learners, strategies):
+        expected = [
+            {"target": target, "items_to_learn": sorted(items_to_learn)}
+            for target, items_to_learn in getattr(ordering, strategy)(CORPUS)
+        ][:15]
+        assert steps[learner_id] == expected
+
+
+def test_sessions_within_the_budget_are_kept():
+    service = SequencingService(load_corpus)
+    learners, steps = asyncio.run(recommend(service, ["frequency"] * 3))
+
+    assert len(service.sessions) == 3
+    assert service.session_bytes == sum(service.sessions.values())
+    assert service.health()["session_bytes"] == service.session_bytes
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from sequencing_tools import ordering
+from sequencing_tools.problem import Problem
+from sequencing_tools.session import (
+    FrequencyOptimisedSession,
+    FrequencySession,
+    Session,
+)
+
+
+def corpus(seed):
+    rng = random.Random(seed)
+    items = [f"item{i}" for i in range(rng.randint(2, 40))]
+    weights = [1 / (rank + 1) for rank in range(len(items))]
+    return {
+        f"target{i}": rng.choices(items, weights, k=rng.randint(1, 12))
+        for i in range(rng.randint(1, 60))
+    }
+
+
+@pytest.mark.parametrize(
+    "strategy, session_type",
+    [
+        (ordering.frequency, FrequencySession),
+        (ordering.frequency_optimised, FrequencyOptimisedSession),
+    ],
+)
+@pytest.mark.parametrize("seed", range(20))
+def test_session_matches_restarting_strategy(strategy, session_type, seed):
+    rng = random.Random(seed)
+    problem = Problem(corpus(seed))
+    known = set(rng.sample(problem.items, min(3, len(problem.items))))
+    seen = set(rng.sample(problem.targets, min(3, len(problem.targets))))
+    session = session_type(problem, known, seen)
+
+    while True:
+        action = rng.random()
+        if action < 0.1:
+            items = rng.sample(problem.items, min(2, len(problem.items)))
+            session.learn(items)
+            known.update(items)
+        elif action < 0.2:
+            target = rng.choice(problem.targets)
+            session.skip(target)
+            seen.add(target)
+        else:
+            step = session.advance()
+            assert step == next(strategy(problem, known, True, seen), None)
+            if step is None:
+                break
+            known.update(step[1])
+            seen.add(step[0])
+
+
+def test_session_is_abstract():
+    with pytest.raises(TypeError):
+        Session({"a": ["x"]})
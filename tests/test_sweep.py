@@ -0,0 +1,44 @@
+import pytest
+
+from sequencing_tools import ordering
+from sequencing_tools.sweep import Config, sweep
+
+CORPUS = {
+    "a": ["x", "y"],
+    "b": ["y", "z", "z"],
+    "c": ["x", "w"],
+}
+
+
+def load_corpus(name):
+    if name == "broken":
+        raise KeyError(name)
+    return CORPUS
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_failing_configs_are_reported(processes, monkeypatch):
+    def broken(target_items, *args, **kwargs):
+        raise OverflowError("int too large to convert to float")
+        yield
+
+    monkeypatch.setattr(ordering, "next_best", broken)
+    configs = [
+        Config(strategy, corpus, "none")
+        for strategy in ["frequency", "next_best"]
+        for corpus in ["test", "broken"]
+    ]
+    results = {
+        (result["strategy"], result["corpus"]): result
+        for result in sweep(configs, load_corpus, processes=processes)
+    }
+
+    assert results["frequency", "test"]["steps"] == 3
+    assert "error" not in results["frequency", "test"]
+    assert results["next_best", "test"]["error"] == (
+        "OverflowError: int too large to convert to float"
+    )
+    for strategy in ["frequency", "next_best"]:
+        result = results[strategy, "broken"]
+        assert result["error"] == "KeyError: 'broken'"
+        assert result["steps"] is None